@@ -0,0 +1,91 @@
+# commands/benchmark_charts.py
+# Uso: python -m app.commands.benchmark_charts --iterations 50
+# Compara latencia y memoria (RSS) de los gráficos del reporte con matplotlib (PNG) y con el renderizador SVG.
+# Cada renderizador se mide en un proceso nuevo para incluir el costo de importación y aislar la memoria.
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CATEGORIES = ["Arriendo", "Servicios", "Mercado", "Salud", "Transporte", "Educación", "Salidas", "Hobbies", "Ahorros", "Deudas"]
+RENDERERS = ("matplotlib", "svg")
+
+
+def _sample_data():
+    recommended = [float(100000 * (index + 1)) for index in range(len(CATEGORIES))]
+    actual = [value * (0.7 + 0.06 * index) for index, value in enumerate(recommended)]
+    return recommended, actual, dict(zip(CATEGORIES, actual))
+
+
+def _max_rss_mb() -> float:
+    # En Linux ru_maxrss está en KB; en macOS en bytes
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_worker(renderer: str, iterations: int) -> dict:
+    """Renderiza ambos gráficos iterations veces en este proceso y devuelve las métricas."""
+    from app.services import chart_service, svg_charts  # Base común: FastAPI y la caché de artefactos
+
+    recommended, actual, by_category = _sample_data()
+    baseline_rss = _max_rss_mb()
+    latencies = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        for iteration in range(iterations):
+            start = time.perf_counter()
+            if renderer == "matplotlib":
+                # La primera iteración incluye la importación de matplotlib, como en un worker recién creado
+                chart_service._init_worker()
+                chart_service.render_bar_chart(os.path.join(output_dir, "bar.png"), CATEGORIES, recommended, actual)
+                chart_service.render_pie_chart(os.path.join(output_dir, "pie.png"), list(by_category), list(by_category.values()))
+            else:
+                with open(os.path.join(output_dir, "bar.svg"), "w", encoding="utf-8") as f:
+                    f.write(svg_charts.render_bar_chart_svg(CATEGORIES, recommended, actual))
+                with open(os.path.join(output_dir, "pie.svg"), "w", encoding="utf-8") as f:
+                    f.write(svg_charts.render_pie_chart_svg(list(by_category), list(by_category.values())))
+            latencies.append((time.perf_counter() - start) * 1000)
+        output_bytes = sum(os.path.getsize(os.path.join(output_dir, name)) for name in os.listdir(output_dir))
+
+    warm = sorted(latencies[1:]) or latencies
+    return {
+        "renderer": renderer,
+        "iterations": iterations,
+        "first_ms": round(latencies[0], 2),
+        "mean_ms": round(statistics.mean(warm), 2),
+        "p95_ms": round(warm[min(len(warm) - 1, int(len(warm) * 0.95))], 2),
+        "rss_delta_mb": round(_max_rss_mb() - baseline_rss, 1),
+        "peak_rss_mb": round(_max_rss_mb(), 1),
+        "output_kb": round(output_bytes / 1024, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los renderizadores de gráficos del reporte")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--worker", choices=RENDERERS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, max(1, args.iterations))))
+        return
+
+    print(f"{'renderer':<12}{'primera (ms)':>14}{'media (ms)':>12}{'p95 (ms)':>10}{'RSS +MB':>10}{'RSS pico MB':>13}{'salida KB':>11}")
+    for renderer in RENDERERS:
+        completed = subprocess.run(
+            [sys.executable, "-m", "app.commands.benchmark_charts", "--worker", renderer, "--iterations", str(args.iterations)],
+            check=True, capture_output=True, text=True
+        )
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(
+            f"{result['renderer']:<12}{result['first_ms']:>14}{result['mean_ms']:>12}{result['p95_ms']:>10}"
+            f"{result['rss_delta_mb']:>10}{result['peak_rss_mb']:>13}{result['output_kb']:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
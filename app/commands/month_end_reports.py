@@ -0,0 +1,188 @@
+# commands/month_end_reports.py
+# Uso: python -m app.commands.month_end_reports --period 2025-05 --workers 4 --shard-size 1000
+# Pensado para ejecutarse desde cron al cerrar el mes, p. ej.: 15 0 1 * * python -m app.commands.month_end_reports
+# Sincroniza y genera el reporte de cada presupuesto del periodo cerrado en procesos paralelos, repartiendo el trabajo
+# por rangos de user_id. Cada rango terminado se registra en un archivo de checkpoint para poder reanudar; los rangos con
+# presupuestos fallidos guardan la lista completa y al reanudar se reintentan solo esos presupuestos.
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+from dateutil.relativedelta import relativedelta
+from fastapi import HTTPException
+from sqlalchemy import func
+from app.database import SessionLocal
+from app.models.budget import Budget
+from app.services.budget_service import BudgetService
+from app.utils.logging import logger
+
+CHECKPOINT_DIR = os.getenv("REPORT_CHECKPOINT_DIR", "reports/checkpoints")
+
+
+def previous_period(today: date) -> date:
+    return today.replace(day=1) - relativedelta(months=1)
+
+
+def parse_period(raw: str) -> date:
+    return datetime.strptime(raw, "%Y-%m").date()
+
+
+def plan_shards(period: date, shard_size: int) -> List[Tuple[int, int]]:
+    """Rangos [inicio, fin) de user_id que cubren todos los presupuestos del periodo."""
+    db = SessionLocal()
+    try:
+        low, high = db.query(func.min(Budget.user_id), func.max(Budget.user_id)).filter(Budget.period == period).one()
+    finally:
+        db.close()
+    if low is None:
+        return []
+    return [(start, min(start + shard_size, high + 1)) for start in range(low, high + 1, shard_size)]
+
+
+def process_shard(period: date, user_start: int, user_end: int, budget_ids: Optional[List[int]] = None) -> Dict:
+    """Sincroniza y genera los reportes de los presupuestos del periodo cuyos usuarios están en el rango.
+
+    Con budget_ids solo se procesan esos presupuestos del rango (los que fallaron en una ejecución anterior).
+    """
+    started = time.monotonic()
+    stats = {"budgets": 0, "generated": 0, "skipped": 0, "failed": 0, "failed_ids": []}
+    db = SessionLocal()
+    try:
+        query = db.query(Budget.id, Budget.user_id).filter(
+            Budget.period == period,
+            Budget.user_id >= user_start,
+            Budget.user_id < user_end
+        )
+        if budget_ids is not None:
+            query = query.filter(Budget.id.in_(budget_ids))
+        budgets = query.order_by(Budget.id).all()
+        service = BudgetService(db)
+        for budget_id, user_id in budgets:
+            stats["budgets"] += 1
+            try:
+                # El reporte sincroniza el presupuesto de forma incremental antes de calcular los totales
+                service.generate_budget_report(budget_id, user_id)
+                stats["generated"] += 1
+            except HTTPException as e:
+                db.rollback()
+                if e.status_code == 400:
+                    stats["skipped"] += 1  # El periodo aún no cierra
+                    continue
+                # Incluye 412 cuando otra petición sincronizó el presupuesto al mismo tiempo
+                logger.warning(f"No se generó el reporte del presupuesto {budget_id}: {e.status_code} {e.detail}")
+                stats["failed"] += 1
+                stats["failed_ids"].append(budget_id)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Error al generar el reporte del presupuesto {budget_id}: {e}")
+                stats["failed"] += 1
+                stats["failed_ids"].append(budget_id)
+    finally:
+        db.close()
+    stats["seconds"] = round(time.monotonic() - started, 3)
+    return stats
+
+
+def load_checkpoint(path: str, period: date, shard_size: int) -> Dict:
+    if not os.path.exists(path):
+        return {"period": period.isoformat(), "shard_size": shard_size, "completed": {}, "failed": {}}
+    with open(path, "r") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("shard_size") != shard_size:
+        raise SystemExit(
+            f"El checkpoint {path} usa --shard-size {checkpoint.get('shard_size')}; usa el mismo valor o --restart"
+        )
+    checkpoint.setdefault("failed", {})
+    return checkpoint
+
+
+def save_checkpoint(path: str, checkpoint: Dict) -> None:
+    """Escritura atómica: un corte a mitad de escritura no deja un checkpoint corrupto."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def run(period: date, workers: int, shard_size: int, checkpoint_path: str, restart: bool) -> Dict:
+    if restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = load_checkpoint(checkpoint_path, period, shard_size)
+    shards = [shard for shard in plan_shards(period, shard_size) if f"{shard[0]}-{shard[1]}" not in checkpoint["completed"]]
+    logger.info(
+        f"Reportes de {period:%Y-%m}: {len(shards)} rangos pendientes ({len(checkpoint['failed'])} con presupuestos "
+        f"fallidos), {len(checkpoint['completed'])} ya completados"
+    )
+
+    # Cada worker renderiza sus gráficos en su propio proceso en lugar de abrir otro pool por worker
+    os.environ.setdefault("CHART_RENDER_WORKERS", "0")
+    started = time.monotonic()
+    run_totals = {"budgets": 0, "generated": 0, "skipped": 0, "failed": 0}
+    shard_seconds = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {}
+        for start, end in shards:
+            # Un rango con fallos previos solo reintenta los presupuestos que fallaron
+            previous = checkpoint["failed"].get(f"{start}-{end}")
+            budget_ids = previous["failed_ids"] if previous else None
+            futures[executor.submit(process_shard, period, start, end, budget_ids)] = (start, end)
+        for future in as_completed(futures):
+            start, end = futures[future]
+            shard_key = f"{start}-{end}"
+            try:
+                stats = future.result()
+            except Exception as e:
+                # El rango no se marca como completado y se reintentará al reanudar
+                logger.error(f"Error en el rango de usuarios {start}-{end - 1}: {e}")
+                continue
+            if stats["failed"]:
+                # Se guarda la lista completa para reintentar exactamente esos presupuestos al reanudar
+                checkpoint["failed"][shard_key] = stats
+            else:
+                checkpoint["failed"].pop(shard_key, None)
+                checkpoint["completed"][shard_key] = stats
+            save_checkpoint(checkpoint_path, checkpoint)
+            for key in run_totals:
+                run_totals[key] += stats[key]
+            shard_seconds.append(stats["seconds"])
+            logger.info(
+                f"Usuarios {start}-{end - 1}: {stats['generated']} generados, {stats['skipped']} omitidos, "
+                f"{stats['failed']} fallidos en {stats['seconds']:.1f}s"
+            )
+
+    elapsed = time.monotonic() - started
+    metrics = {
+        **run_totals,
+        "shards": len(shard_seconds),
+        "elapsed_seconds": round(elapsed, 2),
+        "budgets_per_second": round(run_totals["budgets"] / elapsed, 2) if elapsed > 0 else 0.0,
+        "shard_seconds_p50": round(statistics.median(shard_seconds), 2) if shard_seconds else 0.0,
+        "shard_seconds_max": round(max(shard_seconds), 2) if shard_seconds else 0.0
+    }
+    checkpoint["last_run"] = metrics
+    save_checkpoint(checkpoint_path, checkpoint)
+    logger.info(
+        f"{metrics['budgets']} presupuestos en {metrics['elapsed_seconds']}s ({metrics['budgets_per_second']} por segundo): "
+        f"{metrics['generated']} generados, {metrics['skipped']} omitidos, {metrics['failed']} fallidos"
+    )
+    return metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera los reportes de fin de mes de todos los presupuestos del periodo cerrado")
+    parser.add_argument("--period", type=parse_period, help="Periodo YYYY-MM; por defecto el mes anterior")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--shard-size", type=int, default=1000, help="Cantidad de user_id por rango")
+    parser.add_argument("--checkpoint", help="Archivo de checkpoint; por defecto uno por periodo en REPORT_CHECKPOINT_DIR")
+    parser.add_argument("--restart", action="store_true", help="Ignora el checkpoint existente y procesa todo de nuevo")
+    args = parser.parse_args()
+
+    target_period = args.period or previous_period(date.today())
+    checkpoint_file = args.checkpoint or os.path.join(CHECKPOINT_DIR, f"month_end_{target_period:%Y-%m}.json")
+    run(target_period, args.workers, args.shard_size, checkpoint_file, args.restart)
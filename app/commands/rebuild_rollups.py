@@ -0,0 +1,64 @@
+# commands/rebuild_rollups.py
+# Uso: python -m app.commands.rebuild_rollups --workers 4 --chunk-size 500
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List
+from app.database import SessionLocal
+from app.models.user import User
+from app.services.rollup_service import RollupService
+from app.utils.logging import logger
+
+
+def iter_user_chunks(chunk_size: int) -> Iterator[List[int]]:
+    """Recorre los ids de usuario por bloques usando paginación por clave."""
+    db = SessionLocal()
+    try:
+        last_id = 0
+        while True:
+            ids = [row.id for row in db.query(User.id).filter(User.id > last_id).order_by(User.id).limit(chunk_size)]
+            if not ids:
+                return
+            yield ids
+            last_id = ids[-1]
+    finally:
+        db.close()
+
+
+def rebuild_chunk(user_ids: List[int]) -> int:
+    """Reconstruye los rollups de un bloque de usuarios en su propia sesión y transacción."""
+    db = SessionLocal()
+    try:
+        RollupService(db).rebuild_users(user_ids)
+        db.commit()
+        return len(user_ids)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def rebuild_all(workers: int, chunk_size: int) -> int:
+    started = time.monotonic()
+    processed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(rebuild_chunk, ids): ids for ids in iter_user_chunks(chunk_size)}
+        for future in as_completed(futures):
+            ids = futures[future]
+            try:
+                processed += future.result()
+                logger.info(f"Rollups reconstruidos para usuarios {ids[0]}-{ids[-1]} ({processed} en total)")
+            except Exception as e:
+                logger.error(f"Error al reconstruir rollups para usuarios {ids[0]}-{ids[-1]}: {e}")
+    logger.info(f"{processed} usuarios procesados en {time.monotonic() - started:.1f}s")
+    return processed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstruye la tabla transaction_rollups desde transactions")
+    # El pool del engine admite 15 conexiones simultáneas (5 + 10 de overflow)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+    rebuild_all(args.workers, args.chunk_size)
@@ -6,6 +6,8 @@ from .routes.user_routes import router as user_router
 from .routes.verification_routes import router as verification_router
 from .routes.transaction_routes import router as transaction_router
 from .routes.budget_routes import router as budget_router
+from .routes.import_routes import router as import_router
+from .routes.analytics_routes import router as analytics_router
 
 app = FastAPI(title="Gestor de Finanzas Personales")
 
@@ -18,6 +20,8 @@ app.include_router(verification_router)
 app.include_router(questionnaire_routes.router)
 app.include_router(budget_router)
 app.include_router(transaction_router)
+app.include_router(import_router)
+app.include_router(analytics_router)
 
 
 if __name__ == "__main__":
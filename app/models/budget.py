@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, JSON, Date, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, JSON, Date, DateTime, ForeignKey
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -11,4 +11,9 @@ class Budget(Base):
     recommended_budget = Column(JSON, nullable=True, default={})  # Ej: {"name": "50/30/20", "distribution": {"Necesidades": 500000, ...}}
     actual_expenses = Column(JSON, nullable=True, default=[])  # Lista de gastos reales
     report = Column(JSON, nullable=True, default={})  # Reporte generado
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=True)
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=True)
+    synced_seq = Column(BigInteger, nullable=False, default=0, server_default="0")  # Marca de agua del feed de cambios en el último sync
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Se incrementa en cada UPDATE (ETag)
+
+    # El ORM añade "AND version = <leída>" a cada UPDATE: una escritura concurrente produce StaleDataError
+    __mapper_args__ = {"version_id_col": version}
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, Enum, DateTime, JSON, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("user_id", "idempotency_key", name="uq_idempotency_keys_user_key"),
+        Index("ix_idempotency_keys_user_expires", "user_id", "expires_at"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    idempotency_key = Column(String(255), nullable=False)
+    method = Column(String(10), nullable=False)
+    path = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    status = Column(Enum("pending", "completed", name="idempotency_status"), nullable=False, default="pending")
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(JSON, nullable=True)
+    response_hash = Column(String(64), nullable=True)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), nullable=False)  # Inicio de la reserva vigente (lease)
+    expires_at = Column(DateTime, nullable=False)
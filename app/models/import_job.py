@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, Enum, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.database import Base
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    filename = Column(String(255), nullable=False)
+    file_path = Column(String(512), nullable=False)  # Copia del archivo subido, necesaria para reanudar
+    format = Column(Enum("csv", "ofx", name="import_format"), nullable=False)
+    status = Column(Enum("pending", "running", "completed", "failed", name="import_status"), nullable=False, default="pending")
+    processed_rows = Column(Integer, nullable=False, default=0)  # Offset del último bloque confirmado
+    imported_rows = Column(Integer, nullable=False, default=0)
+    failed_rows = Column(Integer, nullable=False, default=0)
+    error = Column(String(255), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=True)
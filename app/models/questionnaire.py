@@ -1,5 +1,6 @@
 from sqlalchemy import Column, Integer, JSON, DateTime
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
 Base = declarative_base()
@@ -12,5 +13,30 @@ class Questionnaire(Base):
     ans2 = Column(JSON, nullable=False)
     ans3 = Column(JSON, nullable=False)
     ans4 = Column(JSON, nullable=False)
-    monthly_report = Column(JSON, nullable=True)
-    created_at = Column(DateTime(timezone=True), nullable=True, server_default=func.now())
\ No newline at end of file
+    # Formato anterior del reporte mensual; se migra a questionnaire_expense_entries en la primera escritura
+    monthly_report_data = Column("monthly_report", JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=True, server_default=func.now())
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Se incrementa en cada UPDATE (ETag)
+
+    # El ORM añade "AND version = <leída>" a cada UPDATE: una escritura concurrente produce StaleDataError
+    __mapper_args__ = {"version_id_col": version}
+
+    expense_entries = relationship(
+        "QuestionnaireExpenseEntry",
+        order_by="QuestionnaireExpenseEntry.seq",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
+
+    @property
+    def monthly_report(self):
+        """Vista del reporte mensual armada al leer desde las entradas; el total es el acumulado de la última."""
+        if self.expense_entries:
+            return {
+                "entries": [entry.to_dict() for entry in self.expense_entries],
+                "total": float(self.expense_entries[-1].running_total)
+            }
+        return self.monthly_report_data
+
+# Comparte el Base de este módulo; se importa aquí para que la relación se resuelva siempre
+from app.models.questionnaire_expense_entry import QuestionnaireExpenseEntry  # noqa: E402
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, Numeric, Date, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from app.models.questionnaire import Base
+
+class QuestionnaireExpenseEntry(Base):
+    """Gasto del reporte mensual de un cuestionario. Solo se insertan filas; cada una guarda el total acumulado."""
+    __tablename__ = "questionnaire_expense_entries"
+    __table_args__ = (
+        # El índice único serializa los anexos concurrentes: dos escrituras no pueden tomar el mismo seq
+        UniqueConstraint("questionnaire_id", "seq", name="uq_questionnaire_expense_entries_seq"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    questionnaire_id = Column(Integer, ForeignKey("questionnaires.id", ondelete="CASCADE"), nullable=False)
+    seq = Column(Integer, nullable=False)  # Posición de la entrada dentro del reporte, desde 1
+    category = Column(String(50), nullable=False)
+    amount = Column(Numeric(12, 2), nullable=False)
+    running_total = Column(Numeric(14, 2), nullable=False)  # Suma de amount hasta esta entrada inclusive
+    description = Column(String(255), nullable=True)
+    entry_date = Column(Date, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "category": self.category,
+            "amount": float(self.amount),
+            "description": self.description,
+            "date": self.entry_date.isoformat() if self.entry_date else None
+        }
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, Enum, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.database import Base
+
+class ReportJob(Base):
+    __tablename__ = "report_jobs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    budget_id = Column(Integer, ForeignKey("budgets.id", ondelete="CASCADE"), nullable=False)
+    status = Column(Enum("pending", "running", "completed", "failed", name="report_job_status"), nullable=False, default="pending")
+    # "user_id:budget_id" mientras el trabajo está activo y NULL al terminar; el índice único evita trabajos duplicados
+    active_key = Column(String(64), nullable=True, unique=True)
+    file_path = Column(String(512), nullable=True)
+    error = Column(String(255), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=True)
@@ -1,9 +1,21 @@
-from sqlalchemy import Column, Integer, Enum, DateTime, Float, String, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, Enum, DateTime, Float, String, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.database import Base
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Paginación por cursor ordenada por (created_at, id)
+        Index("ix_transactions_user_created_id", "user_id", "created_at", "id"),
+        # Filtro por conjunto de categorías con el mismo orden
+        Index("ix_transactions_user_category_created_id", "user_id", "category", "created_at", "id"),
+        # Ventanas de gastos por periodo (sync de presupuestos y cuestionarios)
+        Index("ix_transactions_user_type_created", "user_id", "type", "created_at"),
+        # Búsqueda por descripción (comercio); en SQLite se usa un índice invertido local
+        Index("ft_transactions_description", "description", mysql_prefix="FULLTEXT"),
+        # Feed de cambios para sincronización incremental
+        Index("ix_transactions_user_change_seq", "user_id", "change_seq"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -15,4 +27,5 @@ class Transaction(Base):
         "Deudas", "Otros", name="transaction_category"
     ), nullable=True)
     description = Column(String(255), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=True)
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=True)
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")  # Secuencia de cambio por usuario
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, Enum, Date, Numeric, String, ForeignKey
+from app.database import Base
+
+class TransactionRollup(Base):
+    __tablename__ = "transaction_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    month = Column(Date, primary_key=True)  # Primer día del mes
+    category = Column(String(32), primary_key=True)  # Las transacciones sin categoría se agrupan en "Otros"
+    type = Column(Enum("income", "expense", name="transaction_type"), primary_key=True)
+    total_amount = Column(Numeric(14, 2), nullable=False, default=0)
+    transaction_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, BigInteger, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+class TransactionTombstone(Base):
+    __tablename__ = "transaction_tombstones"
+    __table_args__ = (
+        Index("ix_transaction_tombstones_user_change_seq", "user_id", "change_seq"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    transaction_id = Column(Integer, nullable=False)  # Sin FK: la transacción ya no existe
+    change_seq = Column(BigInteger, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=True)
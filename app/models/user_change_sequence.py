@@ -0,0 +1,8 @@
+from sqlalchemy import Column, Integer, BigInteger, ForeignKey
+from app.database import Base
+
+class UserChangeSequence(Base):
+    __tablename__ = "user_change_sequences"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    last_seq = Column(BigInteger, nullable=False, default=0)  # Último número de cambio asignado al usuario
@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date
+from app.database import get_db
+from app.services.analytics_service import AnalyticsService, MAX_ROLLING_WINDOWS, MAX_ROLLING_WINDOW_DAYS
+from app.utils.dependencies import get_current_user
+from app.utils.auth_cache import UserPrincipal
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+def get_analytics_service(db: Session = Depends(get_db)):
+    return AnalyticsService(db)
+
+@router.get("/rolling-spend")
+def get_rolling_spend(
+    windows: List[int] = Query([30, 90]),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user: UserPrincipal = Depends(get_current_user),
+    service: AnalyticsService = Depends(get_analytics_service)
+):
+    permissions = current_user.get_permissions()
+    if not permissions.can_read_transaction():
+        raise HTTPException(status_code=403, detail="No tienes permiso para leer transacciones")
+    if len(windows) > MAX_ROLLING_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"Se permiten como máximo {MAX_ROLLING_WINDOWS} ventanas")
+    if any(window < 1 or window > MAX_ROLLING_WINDOW_DAYS for window in windows):
+        raise HTTPException(status_code=400, detail=f"Cada ventana debe estar entre 1 y {MAX_ROLLING_WINDOW_DAYS} días")
+
+    columns = service.load_columns(current_user.id, start_date, end_date)
+    return service.rolling_spend(columns, tuple(windows))
+
+@router.get("/category-deltas")
+def get_category_deltas(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user: UserPrincipal = Depends(get_current_user),
+    service: AnalyticsService = Depends(get_analytics_service)
+):
+    permissions = current_user.get_permissions()
+    if not permissions.can_read_transaction():
+        raise HTTPException(status_code=403, detail="No tienes permiso para leer transacciones")
+
+    columns = service.load_columns(current_user.id, start_date, end_date)
+    return service.category_month_deltas(columns)
+
+@router.get("/cash-flow")
+def get_cash_flow(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user: UserPrincipal = Depends(get_current_user),
+    service: AnalyticsService = Depends(get_analytics_service)
+):
+    permissions = current_user.get_permissions()
+    if not permissions.can_read_transaction():
+        raise HTTPException(status_code=403, detail="No tienes permiso para leer transacciones")
+
+    columns = service.load_columns(current_user.id, start_date, end_date)
+    return service.cumulative_cash_flow(columns)
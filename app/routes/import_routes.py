@@ -0,0 +1,55 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, UploadFile
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.schemas.import_job import ImportJobOut
+from app.services.import_service import ImportService, run_import_job
+from app.utils.dependencies import get_current_user
+from app.utils.auth_cache import UserPrincipal
+
+router = APIRouter(prefix="/imports", tags=["Imports"])
+
+def get_import_service(db: Session = Depends(get_db)):
+    return ImportService(db)
+
+@router.post("/", response_model=ImportJobOut, status_code=202)
+def create_import(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    current_user: UserPrincipal = Depends(get_current_user),
+    service: ImportService = Depends(get_import_service)
+):
+    permissions = current_user.get_permissions()
+    if not permissions.can_create_transaction():
+        raise HTTPException(status_code=403, detail="No tienes permiso para crear transacciones")
+
+    job = service.create_job(file, current_user.id)
+    background_tasks.add_task(run_import_job, job.id)
+    return job
+
+@router.get("/{job_id}", response_model=ImportJobOut)
+async def get_import(
+    job_id: int,
+    current_user: UserPrincipal = Depends(get_current_user),
+    service: ImportService = Depends(get_import_service)
+):
+    permissions = current_user.get_permissions()
+    if not permissions.can_read_transaction():
+        raise HTTPException(status_code=403, detail="No tienes permiso para leer transacciones")
+
+    return service.get_job(job_id, current_user.id)
+
+@router.post("/{job_id}/resume", response_model=ImportJobOut, status_code=202)
+async def resume_import(
+    job_id: int,
+    background_tasks: BackgroundTasks,
+    current_user: UserPrincipal = Depends(get_current_user),
+    service: ImportService = Depends(get_import_service)
+):
+    permissions = current_user.get_permissions()
+    if not permissions.can_create_transaction():
+        raise HTTPException(status_code=403, detail="No tienes permiso para crear transacciones")
+
+    # Continúa desde el último bloque confirmado (processed_rows)
+    job = service.prepare_resume(job_id, current_user.id)
+    background_tasks.add_task(run_import_job, job.id)
+    return job
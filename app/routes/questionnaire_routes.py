@@ -1,11 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import date
 from app.services.questionnaire_service import QuestionnaireService
 from app.schemas.questionnaire import QuestionnaireCreate, MonthlyReportUpdate, QuestionnaireOut
 from app.database import get_db
 from app.utils.dependencies import get_current_user
-from app.models.user import User
+from app.utils.auth_cache import UserPrincipal
+from app.utils.recommendation_cache import invalidate_questionnaire_recommendations
+from app.utils.etag import check_if_match, commit_versioned
 
 router = APIRouter(prefix="/questionnaires", tags=["Questionnaires"])
 
@@ -15,7 +18,7 @@ def get_questionnaire_service(db: Session = Depends(get_db)):
 @router.post("/", response_model=QuestionnaireCreate)
 async def create_questionnaire(
     questionnaire: QuestionnaireCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     service: QuestionnaireService = Depends(get_questionnaire_service)
 ):
     permissions = current_user.get_permissions()
@@ -34,7 +37,9 @@ async def create_questionnaire(
 @router.get("/{questionnaire_id}", response_model=QuestionnaireOut)
 async def get_questionnaire(
     questionnaire_id: int,
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    current_user: UserPrincipal = Depends(get_current_user),
+    service: QuestionnaireService = Depends(get_questionnaire_service),
     db: Session = Depends(get_db)
 ):
     from app.models.questionnaire import Questionnaire
@@ -46,11 +51,12 @@ async def get_questionnaire(
     questionnaire = query.first()
     if not questionnaire:
         raise HTTPException(status_code=404, detail="Cuestionario no encontrado o no tienes permiso")
+    response.headers["ETag"] = service.get_etag(questionnaire)
     return questionnaire
 
 @router.get("/", response_model=List[QuestionnaireOut])
 async def get_all_questionnaires(
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     from app.models.questionnaire import Questionnaire
@@ -65,7 +71,9 @@ async def get_all_questionnaires(
 async def update_questionnaire(
     questionnaire_id: int,
     questionnaire_update: QuestionnaireCreate,
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: UserPrincipal = Depends(get_current_user),
     service: QuestionnaireService = Depends(get_questionnaire_service),
     db: Session = Depends(get_db)
 ):
@@ -78,6 +86,7 @@ async def update_questionnaire(
     questionnaire = query.first()
     if not questionnaire:
         raise HTTPException(status_code=404, detail="Cuestionario no encontrado o no tienes permiso")
+    check_if_match(if_match, service.get_etag(questionnaire))
 
     questionnaire_update.user_id = current_user.id
     try:
@@ -87,9 +96,11 @@ async def update_questionnaire(
         questionnaire.ans2 = questionnaire_update.ans2
         questionnaire.ans3 = questionnaire_update.ans3
         questionnaire.ans4 = questionnaire_update.ans4
-        questionnaire.monthly_report = questionnaire_update.monthly_report
-        db.commit()
+        service.set_monthly_report(questionnaire, questionnaire_update.monthly_report)
+        commit_versioned(db)
+        invalidate_questionnaire_recommendations(questionnaire.id)
         db.refresh(questionnaire)
+        response.headers["ETag"] = service.get_etag(questionnaire)
         return questionnaire
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -97,7 +108,7 @@ async def update_questionnaire(
 @router.delete("/{questionnaire_id}")
 async def delete_questionnaire(
     questionnaire_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     from app.models.questionnaire import Questionnaire
@@ -112,13 +123,16 @@ async def delete_questionnaire(
 
     db.delete(questionnaire)
     db.commit()
+    invalidate_questionnaire_recommendations(questionnaire_id)
     return {"message": "Cuestionario eliminado exitosamente"}
 
 @router.patch("/{questionnaire_id}/monthly-report", response_model=dict)
 async def update_monthly_report(
     questionnaire_id: int,
     update: MonthlyReportUpdate,
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: UserPrincipal = Depends(get_current_user),
     service: QuestionnaireService = Depends(get_questionnaire_service)
 ):
     permissions = current_user.get_permissions()
@@ -126,9 +140,33 @@ async def update_monthly_report(
         raise HTTPException(status_code=403, detail="No tienes permiso para actualizar cuestionarios")
 
     try:
-        questionnaire = service.update_monthly_report(questionnaire_id, current_user.id, update)
+        questionnaire = service.update_monthly_report(questionnaire_id, current_user.id, update, if_match)
+        response.headers["ETag"] = service.get_etag(questionnaire)
         return questionnaire.monthly_report
     except HTTPException as e:
         raise e
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al actualizar el reporte mensual: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error al actualizar el reporte mensual: {str(e)}")
+
+@router.patch("/{questionnaire_id}/sync", response_model=dict)
+def sync_questionnaire(
+    questionnaire_id: int,
+    response: Response,
+    start_date: date = Query(...),
+    end_date: date = Query(...),
+    mode: str = Query("detailed", pattern="^(summary|detailed)$"),
+    if_match: Optional[str] = Header(None),
+    current_user: UserPrincipal = Depends(get_current_user),
+    service: QuestionnaireService = Depends(get_questionnaire_service)
+):
+    permissions = current_user.get_permissions()
+    if not permissions.can_update_questionnaire():
+        raise HTTPException(status_code=403, detail="No tienes permiso para actualizar cuestionarios")
+    if end_date <= start_date:
+        raise HTTPException(status_code=400, detail="end_date debe ser posterior a start_date")
+
+    summary = service.sync_questionnaire_with_transactions(
+        questionnaire_id, current_user.id, start_date, end_date, mode, if_match
+    )
+    response.headers["ETag"] = summary["etag"]
+    return summary
@@ -1,21 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 from app.database import get_db
-from app.models.user import User
-from app.schemas.transaction import TransactionCreate, TransactionUpdate, TransactionOut
-from app.services.transaction_service import TransactionService
+from app.schemas.transaction import (
+    TransactionCreate, TransactionUpdate, TransactionOut, TransactionFilter, TransactionPage, CategoryEnum,
+    BulkTransactionResult, TransactionSummaryRow, TransactionSearchPage, TransactionChangeFeed
+)
+from app.services.transaction_service import TransactionService, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.services.export_service import export_transactions, EXPORT_FORMATS
+from app.services.aggregation_service import AggregationService
+from app.services.search_service import SearchService
+from app.services.idempotency_service import IdempotencyService
+from app.utils.text_index import invalidate_user_index
+from app.services.change_feed_service import ChangeFeedService, DEFAULT_CHANGES_LIMIT, MAX_CHANGES_LIMIT
 from app.utils.dependencies import get_current_user
+from app.utils.auth_cache import UserPrincipal
 
 router = APIRouter(prefix="/transactions", tags=["Transactions"])
 
 def get_transaction_service(db: Session = Depends(get_db)):
     return TransactionService(db)
 
+def get_transaction_filter(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    type: Optional[str] = Query(None, pattern="^(income|expense)$"),
+    category: Optional[List[CategoryEnum]] = Query(None),
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None
+) -> TransactionFilter:
+    return TransactionFilter(
+        start_date=start_date,
+        end_date=end_date,
+        type=type,
+        categories=category,
+        min_amount=min_amount,
+        max_amount=max_amount
+    )
+
 @router.post("/", response_model=TransactionOut)
 async def create_transaction(
     transaction: TransactionCreate,
-    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    current_user: UserPrincipal = Depends(get_current_user),
     service: TransactionService = Depends(get_transaction_service)
 ):
     permissions = current_user.get_permissions()
@@ -23,13 +52,91 @@ async def create_transaction(
         raise HTTPException(status_code=403, detail="No tienes permiso para crear transacciones")
 
     transaction_dict = transaction.dict(exclude_unset=True)
-    db_transaction = service.create_transaction(transaction_dict, current_user.id)
-    return db_transaction
+    return IdempotencyService(service.db).run(
+        current_user.id, idempotency_key, "POST", "/transactions/", transaction_dict,
+        lambda: TransactionOut.model_validate(service.create_transaction(transaction_dict, current_user.id, commit=False)),
+        after_commit=lambda: invalidate_user_index(current_user.id)
+    )
+
+@router.post("/bulk", response_model=BulkTransactionResult)
+async def bulk_create_transactions(
+    transactions: List[dict] = Body(...),
+    current_user: UserPrincipal = Depends(get_current_user),
+    service: TransactionService = Depends(get_transaction_service)
+):
+    permissions = current_user.get_permissions()
+    if not permissions.can_create_transaction():
+        raise HTTPException(status_code=403, detail="No tienes permiso para crear transacciones")
+
+    # Cada elemento se valida por separado para reportar errores individuales
+    return service.bulk_create_transactions(transactions, current_user.id)
+
+@router.get("/export")
+async def export_user_transactions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+    filters: TransactionFilter = Depends(get_transaction_filter),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    permissions = current_user.get_permissions()
+    if not permissions.can_read_transaction():
+        raise HTTPException(status_code=403, detail="No tienes permiso para leer transacciones")
+
+    filename = f"transactions_{current_user.id}.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        export_transactions(current_user.id, filters, format, gzip),
+        media_type="application/gzip" if gzip else EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/summary", response_model=List[TransactionSummaryRow])
+async def get_transactions_summary(
+    group_by: List[str] = Query(["month", "category", "type"]),
+    filters: TransactionFilter = Depends(get_transaction_filter),
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    permissions = current_user.get_permissions()
+    if not permissions.can_read_transaction():
+        raise HTTPException(status_code=403, detail="No tienes permiso para leer transacciones")
+
+    try:
+        return AggregationService(db).summarize(current_user.id, group_by, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/search", response_model=TransactionSearchPage)
+async def search_transactions(
+    q: str = Query(..., min_length=2),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    filters: TransactionFilter = Depends(get_transaction_filter),
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    permissions = current_user.get_permissions()
+    if not permissions.can_read_transaction():
+        raise HTTPException(status_code=403, detail="No tienes permiso para leer transacciones")
+
+    return SearchService(db).search(current_user.id, q, filters, limit, offset)
+
+@router.get("/changes", response_model=TransactionChangeFeed)
+async def get_transaction_changes(
+    since: Optional[str] = None,
+    limit: int = Query(DEFAULT_CHANGES_LIMIT, ge=1, le=MAX_CHANGES_LIMIT),
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    permissions = current_user.get_permissions()
+    if not permissions.can_read_transaction():
+        raise HTTPException(status_code=403, detail="No tienes permiso para leer transacciones")
+
+    return ChangeFeedService(db).get_changes(current_user.id, since, limit)
 
 @router.get("/{transaction_id}", response_model=TransactionOut)
 async def get_transaction(
     transaction_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     service: TransactionService = Depends(get_transaction_service)
 ):
     permissions = current_user.get_permissions()
@@ -38,22 +145,26 @@ async def get_transaction(
 
     return service.get_transaction(transaction_id, current_user.id)
 
-@router.get("/", response_model=List[TransactionOut])
+@router.get("/", response_model=TransactionPage)
 async def get_all_transactions(
-    current_user: User = Depends(get_current_user),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    filters: TransactionFilter = Depends(get_transaction_filter),
+    current_user: UserPrincipal = Depends(get_current_user),
     service: TransactionService = Depends(get_transaction_service)
 ):
     permissions = current_user.get_permissions()
     if not permissions.can_read_transaction():
         raise HTTPException(status_code=403, detail="No tienes permiso para leer transacciones")
 
-    return service.get_all_transactions(current_user.id)
+    return service.list_transactions(current_user.id, filters, limit, cursor)
 
 @router.put("/{transaction_id}", response_model=TransactionOut)
 async def update_transaction(
     transaction_id: int,
     transaction_update: TransactionUpdate,
-    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    current_user: UserPrincipal = Depends(get_current_user),
     service: TransactionService = Depends(get_transaction_service)
 ):
     permissions = current_user.get_permissions()
@@ -61,16 +172,25 @@ async def update_transaction(
         raise HTTPException(status_code=403, detail="No tienes permiso para editar transacciones")
 
     transaction_dict = transaction_update.dict(exclude_unset=True)
-    return service.update_transaction(transaction_id, transaction_dict, current_user.id)
+    return IdempotencyService(service.db).run(
+        current_user.id, idempotency_key, "PUT", f"/transactions/{transaction_id}", transaction_dict,
+        lambda: TransactionOut.model_validate(service.update_transaction(transaction_id, transaction_dict, current_user.id, commit=False)),
+        after_commit=lambda: invalidate_user_index(current_user.id)
+    )
 
 @router.delete("/{transaction_id}")
 async def delete_transaction(
     transaction_id: int,
-    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    current_user: UserPrincipal = Depends(get_current_user),
     service: TransactionService = Depends(get_transaction_service)
 ):
     permissions = current_user.get_permissions()
     if not permissions.can_delete_transaction():
         raise HTTPException(status_code=403, detail="No tienes permiso para eliminar transacciones")
 
-    return service.delete_transaction(transaction_id, current_user.id)
\ No newline at end of file
+    return IdempotencyService(service.db).run(
+        current_user.id, idempotency_key, "DELETE", f"/transactions/{transaction_id}", None,
+        lambda: service.delete_transaction(transaction_id, current_user.id, commit=False),
+        after_commit=lambda: invalidate_user_index(current_user.id)
+    )
\ No newline at end of file
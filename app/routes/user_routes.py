@@ -9,6 +9,7 @@ from ..schemas.login import LoginRequest
 from ..services.user_service import UserService
 from ..utils.auth import verify_password, create_access_token
 from ..utils.dependencies import get_current_user
+from ..utils.auth_cache import UserPrincipal
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -17,7 +18,7 @@ def get_user_service(db: Session = Depends(get_db)):
 
 @router.get("/", response_model=List[UserOut])
 async def get_all_users(
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     service: UserService = Depends(get_user_service)
 ):
     permissions = current_user.get_permissions()
@@ -54,7 +55,7 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
 @router.get("/{user_id}", response_model=UserOut)
 async def get_user(
     user_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     service: UserService = Depends(get_user_service)
 ):
     permissions = current_user.get_permissions()
@@ -70,7 +71,7 @@ async def get_user(
 async def update_user(
     user_id: int,
     user_update: UserCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     service: UserService = Depends(get_user_service)
 ):
     permissions = current_user.get_permissions()
@@ -85,7 +86,7 @@ async def update_user(
 @router.delete("/{user_id}")
 async def delete_user(
     user_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     service: UserService = Depends(get_user_service)
 ):
     permissions = current_user.get_permissions()
@@ -101,7 +102,7 @@ async def delete_user(
 async def change_user_role(
     user_id: int,
     new_role: str,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     service: UserService = Depends(get_user_service)
 ):
     permissions = current_user.get_permissions()
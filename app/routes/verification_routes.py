@@ -8,6 +8,8 @@ from ..models.user import User
 from ..schemas.verification import VerificationRequest, ResendVerificationRequest, VerificationCodeOut
 from ..services.verification_service import VerificationService
 from ..utils.dependencies import get_current_user
+from ..utils.auth_cache import UserPrincipal
+from ..utils.auth_cache import invalidate_user_principal
 
 router = APIRouter(prefix="/verification", tags=["Verification"])
 
@@ -36,6 +38,7 @@ async def verify_code(request: VerificationRequest, db: Session = Depends(get_db
         user.is_verified = True
         db.delete(verification)
         db.commit()
+        invalidate_user_principal(user.id)
         
         return {"message": "Usuario verificado exitosamente"}
     except Exception as e:
@@ -70,7 +73,7 @@ async def resend_verification(request: ResendVerificationRequest, db: Session =
 @router.get("/{code_id}", response_model=VerificationCodeOut)
 async def get_verification_code(
     code_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     permissions = current_user.get_permissions()
@@ -84,7 +87,7 @@ async def get_verification_code(
 
 @router.get("/", response_model=List[VerificationCodeOut])
 async def get_all_verification_codes(
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     permissions = current_user.get_permissions()
@@ -96,7 +99,7 @@ async def get_all_verification_codes(
 @router.delete("/{code_id}")
 async def delete_verification_code(
     code_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     permissions = current_user.get_permissions()
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime, date
-from typing import Optional, List
+from typing import Optional, List, Dict
 from .transaction import CategoryEnum
 
 class ExpenseEntry(BaseModel):
@@ -42,9 +42,47 @@ class BudgetOut(BaseModel):
     actual_expenses: Optional[List[dict]] = None
     report: Optional[dict] = None
     created_at: datetime
+    version: int
 
     class Config:
         from_attributes = True
         json_encoders = {
             datetime: lambda v: v.isoformat()
-        }
\ No newline at end of file
+        }
+
+class SimulationGrid(BaseModel):
+    # Cada lista es un eje de la grilla; si se omite se usa el valor del cuestionario o los pesos actuales
+    incomes: Optional[List[float]] = None
+    has_debt: Optional[List[str]] = None  # "yes" / "no"
+    savings_interest: Optional[List[str]] = None  # "yes" / "maybe" / "no"
+    weights: Optional[List[Dict[str, float]]] = None  # Ej: {"Gastos": 0.5, "Deudas": 0.25, "Ahorros": 0.15, "Ingresos": 0.1}
+
+class BudgetSimulationRequest(BaseModel):
+    ans2: dict
+    ans3: dict
+    ans4: dict
+    monthly_report: Optional[dict] = None
+    grid: SimulationGrid = SimulationGrid()
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "ans2": {"exact_amount": 1700000.00},
+                "ans3": {"gastos": ["Mercado", "Servicios", "Arriendo"]},
+                "ans4": {"answer": "yes", "savings_interest": "maybe"},
+                "monthly_report": {"entries": [{"category": "Mercado", "amount": 300000.00}], "total": 300000.00},
+                "grid": {"incomes": [1200000, 1700000, 2500000], "has_debt": ["yes", "no"]}
+            }
+        }
+
+class SimulationPoint(BaseModel):
+    income: float
+    has_debt: str
+    savings_interest: str
+    weights: Dict[str, float]
+    budget_name: str
+    score: float
+    distribution: Dict[str, float]
+
+class BudgetSimulationResult(BaseModel):
+    points: List[SimulationPoint]
@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+
+class ImportJobOut(BaseModel):
+    id: int
+    user_id: int
+    filename: str
+    format: str
+    status: str
+    processed_rows: int
+    imported_rows: int
+    failed_rows: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+        json_encoders = {
+            datetime: lambda v: v.isoformat()
+        }
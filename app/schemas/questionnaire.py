@@ -41,6 +41,7 @@ class QuestionnaireOut(BaseModel):
     ans4: dict
     monthly_report: Optional[dict]
     created_at: datetime
+    version: int
 
     class Config:
         from_attributes = True
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 from enum import Enum
 
 # Definir la enumeración para las categorías
@@ -46,4 +46,52 @@ class TransactionOut(TransactionBase):
         from_attributes = True
         json_encoders = {
             datetime: lambda v: v.isoformat()
-        }
\ No newline at end of file
+        }
+
+class TransactionFilter(BaseModel):
+    start_date: Optional[datetime] = None  # Inclusivo
+    end_date: Optional[datetime] = None  # Exclusivo
+    type: Optional[str] = None
+    categories: Optional[List[CategoryEnum]] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+
+class TransactionPage(BaseModel):
+    items: List[TransactionOut]
+    next_cursor: Optional[str] = None
+
+class BulkTransactionItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    errors: Optional[List[str]] = None
+
+class BulkTransactionResult(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkTransactionItemResult]
+
+class TransactionSummaryRow(BaseModel):
+    month: Optional[str] = None
+    category: Optional[str] = None
+    type: Optional[str] = None
+    total: float
+    count: int
+
+class TransactionSearchHit(BaseModel):
+    transaction: TransactionOut
+    score: float
+
+class TransactionSearchPage(BaseModel):
+    items: List[TransactionSearchHit]
+    next_offset: Optional[int] = None
+
+class TransactionChange(BaseModel):
+    op: str  # 'upsert' o 'delete'
+    seq: int
+    transaction_id: int
+    transaction: Optional[TransactionOut] = None
+
+class TransactionChangeFeed(BaseModel):
+    changes: List[TransactionChange]
+    next_cursor: str
+    has_more: bool
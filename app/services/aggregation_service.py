@@ -0,0 +1,122 @@
+from datetime import datetime, time
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+from app.models.transaction import Transaction
+from app.models.transaction_rollup import TransactionRollup
+from app.schemas.transaction import TransactionFilter
+from .transaction_service import apply_transaction_filters
+from .rollup_service import DEFAULT_CATEGORY
+
+GROUP_BY_FIELDS = ("month", "category", "type")
+
+
+def month_expression(db: Session):
+    """Expresión 'AAAA-MM' sobre created_at según el motor de base de datos."""
+    if db.bind.dialect.name == "sqlite":
+        return func.strftime("%Y-%m", Transaction.created_at)
+    return func.date_format(Transaction.created_at, "%Y-%m")
+
+
+class AggregationService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def summarize(self, user_id: int, group_by: List[str], filters: Optional[TransactionFilter] = None) -> List[dict]:
+        """Calcula SUM y COUNT agrupados por mes, categoría y/o tipo directamente en la base de datos."""
+        invalid = [field for field in group_by if field not in GROUP_BY_FIELDS]
+        if invalid:
+            raise ValueError(f"Campos de agrupación inválidos: {invalid}. Deben ser de {list(GROUP_BY_FIELDS)}")
+
+        if self._can_use_rollups(filters):
+            return self._summarize_from_rollups(user_id, group_by, filters)
+
+        columns = {
+            "month": month_expression(self.db),
+            # Igual que en el rollup, para que la categoría no dependa de qué camino responde la consulta
+            "category": func.coalesce(Transaction.category, DEFAULT_CATEGORY),
+            "type": Transaction.type
+        }
+        keys = [columns[field].label(field) for field in GROUP_BY_FIELDS if field in group_by]
+
+        query = self.db.query(
+            *keys,
+            func.coalesce(func.sum(Transaction.amount), 0).label("total"),
+            func.count(Transaction.id).label("count")
+        ).filter(Transaction.user_id == user_id)
+        query = apply_transaction_filters(query, filters)
+        if keys:
+            query = query.group_by(*keys).order_by(*keys)
+
+        return [
+            {
+                "month": getattr(row, "month", None),
+                "category": getattr(row, "category", None),
+                "type": getattr(row, "type", None),
+                "total": float(row.total),
+                "count": row.count
+            }
+            for row in query.all()
+        ]
+
+    @staticmethod
+    def _is_month_boundary(value: Optional[datetime]) -> bool:
+        return value is None or (value.day == 1 and value.time() == time(0))
+
+    def _can_use_rollups(self, filters: Optional[TransactionFilter]) -> bool:
+        """El rollup responde cualquier consulta sin filtros de monto y con fechas alineadas a meses."""
+        if filters is None:
+            return True
+        return (
+            filters.min_amount is None and filters.max_amount is None
+            and self._is_month_boundary(filters.start_date)
+            and self._is_month_boundary(filters.end_date)
+        )
+
+    def _summarize_from_rollups(self, user_id: int, group_by: List[str], filters: Optional[TransactionFilter]) -> List[dict]:
+        columns = {
+            "month": TransactionRollup.month,
+            "category": TransactionRollup.category,
+            "type": TransactionRollup.type
+        }
+        keys = [columns[field].label(field) for field in GROUP_BY_FIELDS if field in group_by]
+        query = self.db.query(
+            *keys,
+            func.coalesce(func.sum(TransactionRollup.total_amount), 0).label("total"),
+            func.coalesce(func.sum(TransactionRollup.transaction_count), 0).label("count")
+        ).filter(TransactionRollup.user_id == user_id)
+        if filters is not None:
+            if filters.start_date is not None:
+                query = query.filter(TransactionRollup.month >= filters.start_date.date())
+            if filters.end_date is not None:
+                query = query.filter(TransactionRollup.month < filters.end_date.date())
+            if filters.type is not None:
+                query = query.filter(TransactionRollup.type == filters.type)
+            if filters.categories:
+                query = query.filter(TransactionRollup.category.in_([c.value for c in filters.categories]))
+        if keys:
+            query = query.group_by(*keys).order_by(*keys)
+
+        return [
+            {
+                "month": row.month.strftime("%Y-%m") if "month" in group_by else None,
+                "category": getattr(row, "category", None),
+                "type": getattr(row, "type", None),
+                "total": float(row.total),
+                "count": int(row.count)
+            }
+            for row in query.all()
+        ]
+
+    def category_totals(self, user_id: int, start_date, end_date, transaction_type: str = "expense") -> Dict[str, float]:
+        """Total por categoría en [start_date, end_date), listo para el reporte o el recomendador."""
+        rows = self.db.query(
+            Transaction.category,
+            func.sum(Transaction.amount)
+        ).filter(
+            Transaction.user_id == user_id,
+            Transaction.type == transaction_type,
+            Transaction.created_at >= start_date,
+            Transaction.created_at < end_date
+        ).group_by(Transaction.category).all()
+        return {category or DEFAULT_CATEGORY: float(total or 0) for category, total in rows}
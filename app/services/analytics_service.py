@@ -0,0 +1,110 @@
+from datetime import date
+from typing import Dict, List, Optional
+import numpy as np
+from sqlalchemy.orm import Session
+from app.models.transaction import Transaction
+from app.schemas.transaction import CategoryEnum
+
+CATEGORIES = [category.value for category in CategoryEnum]
+CATEGORY_CODES = {category: code for code, category in enumerate(CATEGORIES)}
+OTHER_CODE = CATEGORY_CODES[CategoryEnum.OTROS.value]
+UNIX_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+MAX_ROLLING_WINDOWS = 10
+MAX_ROLLING_WINDOW_DAYS = 3660  # Unos diez años
+
+# Registro columnar compacto: 18 bytes por transacción
+ROW_DTYPE = np.dtype([
+    ("day", np.int64),        # date.toordinal()
+    ("amount", np.float64),
+    ("category", np.uint8),   # Índice en CategoryEnum
+    ("is_expense", np.bool_)
+])
+
+
+class AnalyticsService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def load_columns(self, user_id: int, start_date: Optional[date] = None, end_date: Optional[date] = None) -> np.ndarray:
+        """Carga las transacciones del usuario como un arreglo estructurado, sin crear objetos ORM."""
+        query = self.db.query(
+            Transaction.created_at,
+            Transaction.amount,
+            Transaction.category,
+            Transaction.type
+        ).filter(Transaction.user_id == user_id, Transaction.created_at.is_not(None))
+        if start_date is not None:
+            query = query.filter(Transaction.created_at >= start_date)
+        if end_date is not None:
+            query = query.filter(Transaction.created_at < end_date)
+        rows = query.execution_options(stream_results=True, yield_per=5000)
+
+        return np.fromiter(
+            (
+                (
+                    created_at.toordinal(),
+                    amount or 0.0,
+                    CATEGORY_CODES.get(category, OTHER_CODE),
+                    transaction_type == "expense"
+                )
+                for created_at, amount, category, transaction_type in rows
+            ),
+            dtype=ROW_DTYPE
+        )
+
+    @staticmethod
+    def _day_axis(columns: np.ndarray) -> np.ndarray:
+        return np.arange(columns["day"].min(), columns["day"].max() + 1)
+
+    @staticmethod
+    def _daily_totals(columns: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        offsets = columns["day"] - columns["day"].min()
+        return np.bincount(offsets, weights=weights, minlength=int(offsets.max()) + 1)
+
+    @staticmethod
+    def _ordinals_to_iso(days: np.ndarray) -> List[str]:
+        return np.datetime_as_string((days - UNIX_EPOCH_ORDINAL).astype("datetime64[D]")).tolist()
+
+    def rolling_spend(self, columns: np.ndarray, windows: tuple = (30, 90)) -> Dict:
+        """Gasto acumulado en ventanas móviles de N días, calculado con sumas prefijas."""
+        if columns.size == 0:
+            return {"dates": [], **{f"rolling_{window}d": [] for window in windows}}
+        daily = self._daily_totals(columns, np.where(columns["is_expense"], columns["amount"], 0.0))
+        prefix = np.concatenate(([0.0], np.cumsum(daily)))
+        result = {"dates": self._ordinals_to_iso(self._day_axis(columns))}
+        for window in windows:
+            # prefix[i + 1] - prefix[max(i + 1 - window, 0)]
+            end = np.arange(1, daily.size + 1)
+            result[f"rolling_{window}d"] = (prefix[end] - prefix[np.maximum(end - window, 0)]).round(2).tolist()
+        return result
+
+    def category_month_deltas(self, columns: np.ndarray) -> Dict:
+        """Gasto por mes y categoría como matriz (meses x categorías) y sus diferencias mes a mes."""
+        expenses = columns[columns["is_expense"]]
+        if expenses.size == 0:
+            return {"months": [], "categories": CATEGORIES, "totals": [], "deltas": []}
+        months = (expenses["day"] - UNIX_EPOCH_ORDINAL).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        month_offsets = months - months.min()
+        month_count = int(month_offsets.max()) + 1
+        flat = month_offsets * len(CATEGORIES) + expenses["category"]
+        totals = np.bincount(flat, weights=expenses["amount"], minlength=month_count * len(CATEGORIES))
+        totals = totals.reshape(month_count, len(CATEGORIES))
+        month_labels = np.arange(months.min(), months.max() + 1).astype("datetime64[M]")
+        return {
+            "months": np.datetime_as_string(month_labels).tolist(),
+            "categories": CATEGORIES,
+            "totals": totals.round(2).tolist(),
+            "deltas": np.diff(totals, axis=0).round(2).tolist()
+        }
+
+    def cumulative_cash_flow(self, columns: np.ndarray) -> Dict:
+        """Flujo de caja neto acumulado por día (ingresos positivos, gastos negativos)."""
+        if columns.size == 0:
+            return {"dates": [], "net": [], "cumulative": []}
+        signed = np.where(columns["is_expense"], -columns["amount"], columns["amount"])
+        daily = self._daily_totals(columns, signed)
+        return {
+            "dates": self._ordinals_to_iso(self._day_axis(columns)),
+            "net": daily.round(2).tolist(),
+            "cumulative": np.cumsum(daily).round(2).tolist()
+        }
@@ -2,6 +2,9 @@ from abc import ABC, abstractmethod
 from typing import Dict, List, Tuple, Optional
 from datetime import date
 from app.models.questionnaire import Questionnaire
+from app.utils.artifact_cache import content_key
+from app.utils.recommendation_cache import get_recommendation_cache
+import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
@@ -28,6 +31,14 @@ EXPENSE_GROUPS = {
     }
 }
 
+# Índice plano categoría -> grupo, derivado de EXPENSE_GROUPS
+CATEGORY_GROUPS = {
+    category: group
+    for group, subgroups in EXPENSE_GROUPS.items()
+    for items in subgroups.values()
+    for category in items
+}
+
 # Definir presupuestos con criterios de alineación
 BUDGETS = {
     "50/30/20": {"Vitales": 50, "Ocio": 30, "Financieros": 20, "Complejidad": "Baja", "Deudas_Prioridad": "Media", "Ahorros_Prioridad": "Media"},
@@ -42,10 +53,44 @@ BUDGETS = {
     "Personalizado": {"Vitales": 0, "Ocio": 0, "Financieros": 0, "Complejidad": "Alta", "Deudas_Prioridad": "Alta", "Ahorros_Prioridad": "Alta"}
 }
 
+# Tablas numéricas compiladas desde BUDGETS para puntuar todas las plantillas en una sola operación
+GROUPS = ("Vitales", "Ocio", "Financieros")
+PRIORITY_LEVELS = ("Baja", "Media", "Alta")
+COMPLEXITY_LEVELS = ("Muy Baja", "Baja", "Media", "Alta")
+INCOME_BRACKETS = np.array([500000, 2000000])  # < 500.000, < 2.000.000, el resto
+SAVINGS_ANSWERS = ("yes", "maybe")  # Cualquier otra respuesta usa la última fila de SAVINGS_SCORES
+
+BUDGET_NAMES = list(BUDGETS)
+BUDGET_TARGETS = np.array([[BUDGETS[name][group] for group in GROUPS] for name in BUDGET_NAMES], dtype=float)
+BUDGET_DEBT_LEVEL = np.array([PRIORITY_LEVELS.index(BUDGETS[name]["Deudas_Prioridad"]) for name in BUDGET_NAMES])
+BUDGET_SAVINGS_LEVEL = np.array([PRIORITY_LEVELS.index(BUDGETS[name]["Ahorros_Prioridad"]) for name in BUDGET_NAMES])
+BUDGET_COMPLEXITY = np.array([COMPLEXITY_LEVELS.index(BUDGETS[name]["Complejidad"]) for name in BUDGET_NAMES])
+
+# Puntajes por [respuesta, nivel de la plantilla]; columnas en el orden de PRIORITY_LEVELS / COMPLEXITY_LEVELS
+DEBT_SCORES = np.array([
+    [100, 70, 50],   # Sin deudas
+    [30, 70, 100]    # Con deudas
+], dtype=float)
+SAVINGS_SCORES = np.array([
+    [30, 70, 100],   # yes
+    [50, 100, 70],   # maybe
+    [100, 70, 50]    # no
+], dtype=float)
+INCOME_SCORES = np.array([
+    [100, 100, 70, 30],  # Ingreso < 500.000
+    [50, 100, 100, 70],  # Ingreso < 2.000.000
+    [50, 70, 100, 100]   # Ingreso >= 2.000.000
+], dtype=float)
+WEIGHT_KEYS = ("Gastos", "Deudas", "Ahorros", "Ingresos")
+MAX_SIMULATION_POINTS = 10000
+
 class BudgetRecommender(ABC):
     @abstractmethod
-    def recommend(self, questionnaire: Questionnaire) -> Tuple[str, Dict[str, float]]:
-        """Genera una recomendación de presupuesto basada en el cuestionario."""
+    def recommend(self, questionnaire: Questionnaire, category_totals: Optional[Dict[str, float]] = None) -> Tuple[str, Dict[str, float]]:
+        """Genera una recomendación de presupuesto basada en el cuestionario.
+
+        Si se pasan category_totals (gastos agregados por categoría), se usan en lugar de recorrer monthly_report.
+        """
         pass
 
 class WeightedScoringRecommender(BudgetRecommender):
@@ -69,27 +114,34 @@ class WeightedScoringRecommender(BudgetRecommender):
             return {"Vitales": 0, "Ocio": 0, "Financieros": 0}
         
         for entry in monthly_report["entries"]:
-            category = entry.get("category")
-            amount = entry.get("amount", 0)
-            for group, subgroups in EXPENSE_GROUPS.items():
-                for subgroup, items in subgroups.items():
-                    if category in items:
-                        group_totals[group] += amount
-                        break
+            group = CATEGORY_GROUPS.get(entry.get("category"))
+            if group:
+                group_totals[group] += entry.get("amount", 0)
         
         return {
             group: (amount / total_expenses * 100) if total_expenses > 0 else 0
             for group, amount in group_totals.items()
         }
 
+    def calculate_group_percentages(self, category_totals: Dict[str, float], total: Optional[float] = None) -> Dict[str, float]:
+        """Calcula los porcentajes por grupo a partir de totales ya agregados por categoría (p. ej. desde AggregationService)."""
+        group_totals = {"Vitales": 0, "Ocio": 0, "Financieros": 0}
+        for category, amount in category_totals.items():
+            group = CATEGORY_GROUPS.get(category)
+            if group:
+                group_totals[group] += amount
+        total = sum(category_totals.values()) if total is None else total
+        if not total:
+            return {"Vitales": 0, "Ocio": 0, "Financieros": 0}
+        return {group: amount / total * 100 for group, amount in group_totals.items()}
+
     def count_category_groups(self, categories: List[str]) -> Dict[str, int]:
         """Cuenta cuántas categorías pertenecen a cada grupo (Vitales, Ocio, Financieros)."""
         counts = {"Vitales": 0, "Ocio": 0, "Financieros": 0}
         for category in categories:
-            for group, subgroups in EXPENSE_GROUPS.items():
-                for subgroup, items in subgroups.items():
-                    if category in items:
-                        counts[group] += 1
+            group = CATEGORY_GROUPS.get(category)
+            if group:
+                counts[group] += 1
         return counts
 
     def score_budget(self, budget: Dict, expense_percentages: Dict[str, float], category_counts: Dict[str, int], has_debt: str, savings_interest: str, income: float) -> float:
@@ -226,36 +278,184 @@ class WeightedScoringRecommender(BudgetRecommender):
             }
         return distribution
 
-    def recommend(self, questionnaire: Questionnaire) -> Tuple[str, Dict[str, float]]:
-        """Genera una recomendación de presupuesto basada en el cuestionario."""
+    def weight_vector(self) -> np.ndarray:
+        return np.array([self.weights[key] for key in WEIGHT_KEYS], dtype=float)
+
+    def score_matrix(self, expense_percentages: np.ndarray, category_counts: np.ndarray, has_debt: np.ndarray,
+                     savings_answer: np.ndarray, incomes: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+        """Puntúa N perfiles contra todas las plantillas de BUDGETS a la vez; devuelve una matriz (N, plantillas).
+
+        Equivale a score_budget para cada par. expense_percentages y category_counts son (N, 3) en el orden de GROUPS;
+        has_debt es 0/1, savings_answer el índice en SAVINGS_ANSWERS (2 = otra respuesta) y weights es (4,) o (N, 4).
+        """
+        expense_percentages = np.asarray(expense_percentages, dtype=float)
+        category_counts = np.asarray(category_counts, dtype=float)
+        weights = self.weight_vector() if weights is None else np.asarray(weights, dtype=float)
+        weights = np.broadcast_to(weights, (len(expense_percentages), len(WEIGHT_KEYS)))
+
+        # Sin porcentajes de gasto se compara la proporción de categorías elegidas, solo en grupos con meta > 0
+        total_categories = category_counts.sum(axis=1, keepdims=True)
+        category_shares = category_counts / np.where(total_categories > 0, total_categories, 1) * 100
+        use_expenses = (expense_percentages > 0).any(axis=1)[:, None, None]
+        observed = np.where(use_expenses, expense_percentages[:, None, :],
+                            np.where(BUDGET_TARGETS[None, :, :] > 0, category_shares[:, None, :], 0))
+        group_scores = (100 - np.abs(observed - BUDGET_TARGETS[None, :, :]) * 2).sum(axis=2)
+
+        debt_scores = DEBT_SCORES[np.asarray(has_debt)[:, None], BUDGET_DEBT_LEVEL[None, :]]
+        savings_scores = SAVINGS_SCORES[np.asarray(savings_answer)[:, None], BUDGET_SAVINGS_LEVEL[None, :]]
+        brackets = np.searchsorted(INCOME_BRACKETS, np.asarray(incomes, dtype=float), side="right")
+        income_scores = INCOME_SCORES[brackets[:, None], BUDGET_COMPLEXITY[None, :]]
+
+        return (
+            weights[:, 0:1] * group_scores / 3 +
+            weights[:, 1:2] * debt_scores +
+            weights[:, 2:3] * savings_scores +
+            weights[:, 3:4] * income_scores
+        ) / weights.sum(axis=1, keepdims=True)
+
+    def questionnaire_features(self, questionnaire: Questionnaire, category_totals: Optional[Dict[str, float]] = None) -> Dict:
+        """Extrae y valida las entradas numéricas del recomendador para un cuestionario."""
+        income = float(questionnaire.ans2.get("exact_amount", 0))
+        categories = questionnaire.ans3.get("gastos", [])
+        has_debt = questionnaire.ans4.get("answer", "no")
+        savings_interest = questionnaire.ans4.get("savings_interest", "maybe")
+
+        if not income:
+            raise ValueError("El ingreso mensual debe ser mayor que 0")
+        if not categories:
+            raise ValueError("La lista de categorías no puede estar vacía")
+
+        if category_totals is not None:
+            expense_percentages = self.calculate_group_percentages(category_totals)
+        else:
+            expense_percentages = self.calculate_expense_percentages(questionnaire.monthly_report)
+        category_counts = self.count_category_groups(categories)
+        savings_interest = savings_interest.lower()
+        return {
+            "income": income,
+            "expense_percentages": [expense_percentages[group] for group in GROUPS],
+            "category_counts": [category_counts[group] for group in GROUPS],
+            "has_debt": 1 if has_debt.lower() == "yes" else 0,
+            "savings_answer": SAVINGS_ANSWERS.index(savings_interest) if savings_interest in SAVINGS_ANSWERS else len(SAVINGS_ANSWERS)
+        }
+
+    def cache_key(self, questionnaire: Questionnaire, category_totals: Optional[Dict[str, float]] = None) -> str:
+        """Hash canónico de todo lo que influye en la recomendación: respuestas, gastos y pesos."""
+        expenses = category_totals if category_totals is not None else questionnaire.monthly_report
+        return content_key(
+            questionnaire.ans2, questionnaire.ans3, questionnaire.ans4,
+            category_totals is not None, expenses, self.weight_vector().tolist()
+        )
+
+    def recommend_many(self, questionnaires: List[Questionnaire],
+                       category_totals: Optional[List[Optional[Dict[str, float]]]] = None) -> List[Tuple[str, Dict[str, float]]]:
+        """Recomienda un presupuesto para cada cuestionario puntuando el lote completo como una sola matriz.
+
+        Los cuestionarios cuyo contenido ya se puntuó se sirven desde la caché de recomendaciones.
+        """
+        if not questionnaires:
+            return []
+        cache = get_recommendation_cache()
+        totals = category_totals if category_totals is not None else [None] * len(questionnaires)
         try:
-            income = float(questionnaire.ans2.get("exact_amount", 0))
-            categories = questionnaire.ans3.get("gastos", [])
-            has_debt = questionnaire.ans4.get("answer", "no")
-            savings_interest = questionnaire.ans4.get("savings_interest", "maybe")
-            monthly_report = questionnaire.monthly_report
-            
-            if not income:
-                raise ValueError("El ingreso mensual debe ser mayor que 0")
-            if not categories:
-                raise ValueError("La lista de categorías no puede estar vacía")
-            
-            expense_percentages = self.calculate_expense_percentages(monthly_report)
-            category_counts = self.count_category_groups(categories)
-            
-            best_budget = None
-            best_score = -1
-            
-            for budget_name, budget in BUDGETS.items():
-                score = self.score_budget(budget, expense_percentages, category_counts, has_debt, savings_interest, income)
-                if score > best_score:
-                    best_score = score
-                    best_budget = budget_name
-            
-            distribution = self.generate_distribution(best_budget, income)
-            
-            logger.info(f"Recomendación generada: {best_budget} para usuario {questionnaire.user_id}")
-            return best_budget, distribution
+            keys = [self.cache_key(questionnaire, totals[index]) for index, questionnaire in enumerate(questionnaires)]
+            recommendations = [cache.get(key) for key in keys]
+            misses = [index for index, recommendation in enumerate(recommendations) if recommendation is None]
+            if not misses:
+                return recommendations
+            features = [self.questionnaire_features(questionnaires[index], totals[index]) for index in misses]
+            scores = self.score_matrix(
+                np.array([f["expense_percentages"] for f in features]),
+                np.array([f["category_counts"] for f in features]),
+                np.array([f["has_debt"] for f in features]),
+                np.array([f["savings_answer"] for f in features]),
+                np.array([f["income"] for f in features])
+            )
         except Exception as e:
             logger.error(f"Error al generar recomendación: {str(e)}")
-            raise ValueError(f"Error al generar recomendación: {str(e)}")
\ No newline at end of file
+            raise ValueError(f"Error al generar recomendación: {str(e)}")
+
+        # argmax se queda con la primera plantilla en caso de empate, igual que el recorrido original
+        for index, feature, best_index in zip(misses, features, scores.argmax(axis=1)):
+            best_budget = BUDGET_NAMES[best_index]
+            distribution = self.generate_distribution(best_budget, feature["income"])
+            cache.put(keys[index], best_budget, distribution, getattr(questionnaires[index], "id", None))
+            recommendations[index] = (best_budget, distribution)
+        return recommendations
+
+    def simulate(self, questionnaire, incomes: Optional[List[float]] = None, has_debt_values: Optional[List[str]] = None,
+                 savings_values: Optional[List[str]] = None, weights_list: Optional[List[Dict[str, float]]] = None) -> List[Dict]:
+        """Puntúa cada combinación de la grilla contra todas las plantillas en una sola pasada, sin escribir nada.
+
+        Los ejes que no se pasan toman el valor del cuestionario (o los pesos actuales). Los gastos y las categorías
+        del cuestionario son comunes a todos los puntos.
+        """
+        base = self.questionnaire_features(questionnaire)
+        incomes = incomes or [base["income"]]
+        has_debt_values = has_debt_values or [questionnaire.ans4.get("answer", "no")]
+        savings_values = savings_values or [questionnaire.ans4.get("savings_interest", "maybe")]
+        weights_list = weights_list or [self.weights]
+
+        if any(income <= 0 for income in incomes):
+            raise ValueError("Los ingresos simulados deben ser mayores que 0")
+        weight_rows = []
+        for weights in weights_list:
+            unknown = set(weights) - set(WEIGHT_KEYS)
+            if unknown:
+                raise ValueError(f"Pesos desconocidos: {sorted(unknown)}. Deben ser de {list(WEIGHT_KEYS)}")
+            row = [float(weights.get(key, self.weights[key])) for key in WEIGHT_KEYS]
+            if min(row) < 0 or sum(row) <= 0:
+                raise ValueError("Los pesos deben ser no negativos y sumar más que 0")
+            weight_rows.append(row)
+
+        shape = (len(incomes), len(has_debt_values), len(savings_values), len(weight_rows))
+        if int(np.prod(shape)) > MAX_SIMULATION_POINTS:
+            raise ValueError(f"La grilla tiene {int(np.prod(shape))} combinaciones; el máximo es {MAX_SIMULATION_POINTS}")
+
+        # Un índice por eje para cada punto de la grilla, en orden lexicográfico
+        income_index, debt_index, savings_index, weight_index = np.indices(shape).reshape(len(shape), -1)
+        points = len(income_index)
+        debt_codes = np.array([1 if value.lower() == "yes" else 0 for value in has_debt_values])
+        savings_codes = np.array([
+            SAVINGS_ANSWERS.index(value.lower()) if value.lower() in SAVINGS_ANSWERS else len(SAVINGS_ANSWERS)
+            for value in savings_values
+        ])
+        income_values = np.array(incomes, dtype=float)[income_index]
+        weight_matrix = np.array(weight_rows)[weight_index]
+        scores = self.score_matrix(
+            np.tile(base["expense_percentages"], (points, 1)),
+            np.tile(base["category_counts"], (points, 1)),
+            debt_codes[debt_index],
+            savings_codes[savings_index],
+            income_values,
+            weight_matrix
+        )
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(points), best]
+
+        distributions = {}
+        results = []
+        for point in range(points):
+            budget_name = BUDGET_NAMES[best[point]]
+            income = float(income_values[point])
+            if (budget_name, income) not in distributions:
+                distributions[(budget_name, income)] = self.generate_distribution(budget_name, income)
+            results.append({
+                "income": income,
+                "has_debt": has_debt_values[debt_index[point]],
+                "savings_interest": savings_values[savings_index[point]],
+                "weights": dict(zip(WEIGHT_KEYS, weight_rows[weight_index[point]])),
+                "budget_name": budget_name,
+                "score": round(float(best_scores[point]), 4),
+                "distribution": distributions[(budget_name, income)]
+            })
+        return results
+
+    def recommend(self, questionnaire: Questionnaire, category_totals: Optional[Dict[str, float]] = None) -> Tuple[str, Dict[str, float]]:
+        """Genera una recomendación de presupuesto basada en el cuestionario.
+
+        Si se pasan category_totals (gastos agregados por categoría), se usan en lugar de recorrer monthly_report.
+        """
+        best_budget, distribution = self.recommend_many([questionnaire], [category_totals])[0]
+        logger.info(f"Recomendación generada: {best_budget} para usuario {questionnaire.user_id}")
+        return best_budget, distribution
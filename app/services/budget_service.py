@@ -2,13 +2,24 @@ from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from app.models.budget import Budget
 from app.models.questionnaire import Questionnaire
+from app.models.transaction import Transaction
+from app.models.transaction_tombstone import TransactionTombstone
+from app.models.user_change_sequence import UserChangeSequence
 from app.schemas.budget import BudgetCreate
 from .budget_recommendation import WeightedScoringRecommender
+from .transaction_service import TransactionService
+from .rollup_service import DEFAULT_CATEGORY
+from .chart_service import render_report_charts
+from app.utils.artifact_cache import content_key
+from app.utils.etag import check_if_match, commit_versioned, format_etag
+from typing import Optional
+from collections import defaultdict
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
-import matplotlib.pyplot as plt
 import os
 
+REPORT_VERSION = "2"  # Cambiarlo cuando cambie el contenido del reporte invalida los reportes guardados
+
 class BudgetService:
     def __init__(self, db: Session):
         self.db = db
@@ -41,13 +52,47 @@ class BudgetService:
         self.db.refresh(db_budget)
         return db_budget
 
+    def get_budget(self, budget_id: int, user_id: int) -> Budget:
+        budget = self.db.query(Budget).filter(
+            Budget.id == budget_id,
+            Budget.user_id == user_id
+        ).first()
+        if not budget:
+            raise HTTPException(status_code=404, detail="Presupuesto no encontrado o no pertenece al usuario")
+        return budget
+
+    @staticmethod
+    def etag(budget: Budget) -> str:
+        return format_etag(budget.version)
+
+    def update_budget(self, budget_id: int, budget_dict: dict, user_id: int, if_match: Optional[str] = None) -> Budget:
+        """Actualiza los campos enviados; con If-Match solo se aplica si el presupuesto no cambió desde que se leyó."""
+        budget = self.get_budget(budget_id, user_id)
+        check_if_match(if_match, self.etag(budget))
+        for field, value in budget_dict.items():
+            setattr(budget, field, value)
+        commit_versioned(self.db)
+        self.db.refresh(budget)
+        return budget
+
+    def delete_budget(self, budget_id: int, user_id: int, if_match: Optional[str] = None) -> dict:
+        budget = self.get_budget(budget_id, user_id)
+        check_if_match(if_match, self.etag(budget))
+        self.db.delete(budget)
+        commit_versioned(self.db)
+        return {"message": "Presupuesto eliminado exitosamente"}
+
     def get_all_budgets(self, user_id: int) -> list[Budget]:
         """Obtiene todos los presupuestos de un usuario."""
         budgets = self.db.query(Budget).filter(Budget.user_id == user_id).all()
         return budgets
 
-    def sync_budget(self, budget_id: int, user_id: int):
-        from app.models.transaction import Transaction
+    def sync_budget(self, budget_id: int, user_id: int, mode: str = "incremental", if_match: Optional[str] = None):
+        """Sincroniza actual_expenses con las transacciones del periodo.
+
+        En modo incremental solo se leen los cambios posteriores a budget.synced_seq (la marca de agua del feed de
+        cambios); en modo full, o si el presupuesto nunca se sincronizó, se reconstruye la lista completa.
+        """
         budget = self.db.query(Budget).filter(
             Budget.id == budget_id,
             Budget.user_id == user_id
@@ -55,32 +100,72 @@ class BudgetService:
 
         if not budget:
             raise HTTPException(status_code=404, detail="Presupuesto no encontrado o no pertenece al usuario")
+        check_if_match(if_match, self.etag(budget))
+
+        self._sync_expenses(budget, user_id, mode)
+        commit_versioned(self.db)
+        self.db.refresh(budget)
+        return budget
 
+    def _sync_expenses(self, budget: Budget, user_id: int, mode: str = "incremental") -> None:
+        """Actualiza actual_expenses y synced_seq del presupuesto. No hace commit."""
         start_date = budget.period
         end_date = start_date + relativedelta(months=1)
 
-        transactions = self.db.query(Transaction).filter(
+        if mode == "full" or not budget.synced_seq:
+            # La marca se lee antes de la consulta: un cambio confirmado entre ambas se aplicará en el próximo sync
+            watermark = self._last_change_seq(user_id)
+            transactions = TransactionService(self.db).expense_window_query(user_id, start_date, end_date).all()
+            budget.actual_expenses = [self._expense_entry(transaction) for transaction in transactions]
+            budget.synced_seq = watermark
+        else:
+            self._apply_changes(budget, user_id, start_date, end_date)
+
+    @staticmethod
+    def _expense_entry(transaction) -> dict:
+        return {
+            "transaction_id": transaction.id,
+            "category": transaction.category,
+            "amount": float(transaction.amount),
+            "description": transaction.description,
+            "date": transaction.created_at.date().isoformat()
+        }
+
+    def _last_change_seq(self, user_id: int) -> int:
+        last_seq = self.db.query(UserChangeSequence.last_seq).filter(UserChangeSequence.user_id == user_id).scalar()
+        return last_seq or 0
+
+    def _apply_changes(self, budget: Budget, user_id: int, start_date, end_date) -> None:
+        """Aplica sobre actual_expenses solo las transacciones creadas, editadas o eliminadas desde la marca de agua."""
+        changed = self.db.query(Transaction).filter(
             Transaction.user_id == user_id,
-            Transaction.created_at >= start_date,
-            Transaction.created_at < end_date,
-            Transaction.type.lower() == "expense"
+            Transaction.change_seq > budget.synced_seq
+        ).all()
+        deleted = self.db.query(TransactionTombstone).filter(
+            TransactionTombstone.user_id == user_id,
+            TransactionTombstone.change_seq > budget.synced_seq
         ).all()
+        if not changed and not deleted:
+            return
 
-        budget.actual_expenses = []
-        for transaction in transactions:
-            expense_entry = {
-                "category": transaction.category,
-                "amount": float(transaction.amount),
-                "description": transaction.description,
-                "date": transaction.created_at.date().isoformat()
-            }
-            budget.actual_expenses.append(expense_entry)
+        entries = {entry.get("transaction_id"): entry for entry in budget.actual_expenses or []}
+        for tombstone in deleted:
+            entries.pop(tombstone.transaction_id, None)
+        for transaction in changed:
+            created = transaction.created_at.date() if transaction.created_at else None
+            # Una edición puede sacar la transacción del periodo o cambiar su tipo
+            if transaction.type == "expense" and created is not None and start_date <= created < end_date:
+                entries[transaction.id] = self._expense_entry(transaction)
+            else:
+                entries.pop(transaction.id, None)
 
-        self.db.commit()
-        self.db.refresh(budget)
-        return budget
+        budget.actual_expenses = list(entries.values())
+        budget.synced_seq = max(
+            [budget.synced_seq] + [t.change_seq for t in changed] + [t.change_seq for t in deleted]
+        )
 
-    def generate_budget_report(self, budget_id: int, user_id: int) -> dict:
+    def get_reportable_budget(self, budget_id: int, user_id: int) -> Budget:
+        """Devuelve el presupuesto si existe y su periodo ya permite generar el reporte."""
         budget = self.db.query(Budget).filter(
             Budget.id == budget_id,
             Budget.user_id == user_id
@@ -92,17 +177,30 @@ class BudgetService:
         today = datetime.now().date()
         if today < budget.period.replace(day=1) + relativedelta(months=1, days=-1):
             raise HTTPException(status_code=400, detail="El reporte solo se puede generar al final del mes")
+        return budget
+
+    def generate_budget_report(self, budget_id: int, user_id: int) -> dict:
+        budget = self.get_reportable_budget(budget_id, user_id)
+
+        # Las entradas, el total y las sumas por categoría salen de la misma sincronización, en la misma transacción
+        self._sync_expenses(budget, user_id, "incremental")
+        by_category = defaultdict(float)
+        for entry in budget.actual_expenses or []:
+            by_category[entry.get("category") or DEFAULT_CATEGORY] += entry.get("amount") or 0
+        by_category = dict(sorted(by_category.items()))
+
+        # Con las mismas entradas el reporte guardado sigue vigente y no se vuelve a renderizar nada
+        cache_key = content_key(REPORT_VERSION, budget.period, budget.recommended_budget, budget.actual_expenses, by_category)
+        cached_report = budget.report or {}
+        if cached_report.get("cache_key") == cache_key and self._charts_available(cached_report.get("charts")):
+            commit_versioned(self.db)  # Conserva el avance de synced_seq aunque no haya cambiado ninguna entrada
+            return cached_report
 
-        # Calcular gastos reales por categoría
         actual_expenses = {
             "entries": budget.actual_expenses,
-            "total": sum(entry["amount"] for entry in budget.actual_expenses),
-            "by_category": {}
+            "total": sum(by_category.values()),
+            "by_category": by_category
         }
-        for entry in budget.actual_expenses:
-            category = entry["category"]
-            amount = entry["amount"]
-            actual_expenses["by_category"][category] = actual_expenses["by_category"].get(category, 0) + amount
 
         # Comparar con presupuesto recomendado
         recommended_budget = budget.recommended_budget["distribution"]
@@ -112,7 +210,8 @@ class BudgetService:
 
         # Análisis de desviaciones
         deviations = {}
-        for category in set(recommended_budget.keys()).union(actual_expenses["by_category"].keys()):
+        categories = sorted(set(recommended_budget.keys()).union(actual_expenses["by_category"].keys()))
+        for category in categories:
             recommended = recommended_budget.get(category, 0)
             actual = actual_expenses["by_category"].get(category, 0)
             deviation = actual - recommended
@@ -136,49 +235,16 @@ class BudgetService:
                 if data["deviation"] > 0:
                     recommendations.append(f"- {category}: Gastaste ${data['deviation']:,.0f} más de lo recomendado. Considera reducir gastos en esta área.")
 
-        # Generar gráficos
-        output_dir = "reports"
-        os.makedirs(output_dir, exist_ok=True)
-        budget_id_str = str(budget_id)
-
-        # Gráfico de barras
-        categories = list(set(recommended_budget.keys()).union(actual_expenses["by_category"].keys()))
+        # Generar gráficos con el renderizador configurado (o reutilizarlos de la caché de artefactos)
         recommended_values = [recommended_budget.get(cat, 0) for cat in categories]
         actual_values = [actual_expenses["by_category"].get(cat, 0) for cat in categories]
-
-        plt.figure(figsize=(10, 6))
-        bar_width = 0.35
-        x = range(len(categories))
-        plt.bar([i - bar_width/2 for i in x], recommended_values, bar_width, label="Recomendado", color="skyblue")
-        plt.bar([i + bar_width/2 for i in x], actual_values, bar_width, label="Real", color="salmon")
-        plt.xlabel("Categorías")
-        plt.ylabel("Monto (COP)")
-        plt.title("Comparación de Presupuesto Recomendado vs. Real")
-        plt.xticks(x, categories, rotation=45)
-        plt.legend()
-        plt.tight_layout()
-        bar_chart_path = f"{output_dir}/bar_chart_{budget_id_str}.png"
-        plt.savefig(bar_chart_path)
-        plt.close()
-
-        # Gráfico circular
-        pie_chart_path = None
-        if actual_expenses["by_category"]:
-            plt.figure(figsize=(8, 8))
-            plt.pie(
-                list(actual_expenses["by_category"].values()),
-                labels=list(actual_expenses["by_category"].keys()),
-                autopct="%1.1f%%",
-                startangle=140,
-                colors=['#ff9999','#66b3ff','#99ff99','#ffcc99']
-            )
-            plt.title("Distribución de Gastos Reales")
-            pie_chart_path = f"{output_dir}/pie_chart_{budget_id_str}.png"
-            plt.savefig(pie_chart_path)
-            plt.close()
+        charts = render_report_charts(
+            categories, recommended_values, actual_values, actual_expenses["by_category"]
+        )
 
         # Guardar reporte en la base de datos
         report = {
+            "cache_key": cache_key,
             "period": budget.period.isoformat(),
             "recommended_budget": budget.recommended_budget,
             "actual_expenses": actual_expenses,
@@ -190,13 +256,17 @@ class BudgetService:
                 "deviations": deviations
             },
             "recommendations": recommendations,
-            "charts": {
-                "bar_chart": bar_chart_path,
-                "pie_chart": pie_chart_path
-            }
+            "charts": charts
         }
         budget.report = report
-        self.db.commit()
+        commit_versioned(self.db)
         self.db.refresh(budget)
 
-        return report
\ No newline at end of file
+        return report
+
+    @staticmethod
+    def _charts_available(charts) -> bool:
+        """Los gráficos de un reporte guardado pueden haber sido desalojados de la caché."""
+        if not charts or not charts.get("bar_chart"):
+            return False
+        return all(os.path.exists(path) for path in charts.values() if path)
@@ -0,0 +1,79 @@
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.transaction import Transaction
+from app.models.transaction_tombstone import TransactionTombstone
+from app.models.user_change_sequence import UserChangeSequence
+from app.utils.pagination import encode_sequence_cursor, decode_sequence_cursor
+
+DEFAULT_CHANGES_LIMIT = 500
+MAX_CHANGES_LIMIT = 2000
+
+
+class ChangeFeedService:
+    """Asigna números de cambio por usuario y lee los cambios posteriores a un cursor.
+
+    La asignación bloquea la fila del contador del usuario hasta el commit, así los cambios de un mismo
+    usuario se confirman en orden de secuencia y un cliente nunca salta un cambio.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def allocate(self, user_id: int, count: int = 1) -> int:
+        """Reserva count números consecutivos para el usuario y devuelve el primero. No hace commit."""
+        increment = update(UserChangeSequence).where(UserChangeSequence.user_id == user_id).values(
+            last_seq=UserChangeSequence.last_seq + count
+        )
+        if not self.db.execute(increment).rowcount:
+            try:
+                with self.db.begin_nested():
+                    self.db.add(UserChangeSequence(user_id=user_id, last_seq=count))
+            except IntegrityError:
+                # Otra petición creó el contador al mismo tiempo
+                self.db.execute(increment)
+        last_seq = self.db.query(UserChangeSequence.last_seq).filter(UserChangeSequence.user_id == user_id).scalar()
+        return last_seq - count + 1
+
+    def record_delete(self, user_id: int, transaction_id: int) -> None:
+        self.db.add(TransactionTombstone(
+            user_id=user_id,
+            transaction_id=transaction_id,
+            change_seq=self.allocate(user_id)
+        ))
+
+    def get_changes(self, user_id: int, cursor: Optional[str] = None, limit: int = DEFAULT_CHANGES_LIMIT) -> dict:
+        """Devuelve las altas/modificaciones y los borrados posteriores al cursor, en orden de secuencia."""
+        try:
+            since_seq, since_id = decode_sequence_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        limit = max(1, min(limit, MAX_CHANGES_LIMIT))
+
+        # Las transacciones anteriores al feed comparten change_seq = 0; el id desempata
+        upserts = self.db.query(Transaction).filter(
+            Transaction.user_id == user_id,
+            or_(
+                Transaction.change_seq > since_seq,
+                and_(Transaction.change_seq == since_seq, Transaction.id > since_id)
+            )
+        ).order_by(Transaction.change_seq, Transaction.id).limit(limit + 1).all()
+        deletes = self.db.query(TransactionTombstone).filter(
+            TransactionTombstone.user_id == user_id,
+            TransactionTombstone.change_seq > since_seq
+        ).order_by(TransactionTombstone.change_seq).limit(limit + 1).all()
+
+        changes = sorted(
+            [{"op": "upsert", "seq": t.change_seq, "transaction_id": t.id, "transaction": t} for t in upserts] +
+            [{"op": "delete", "seq": d.change_seq, "transaction_id": d.transaction_id, "transaction": None} for d in deletes],
+            key=lambda change: (change["seq"], change["transaction_id"])
+        )
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        if changes:
+            next_cursor = encode_sequence_cursor(changes[-1]["seq"], changes[-1]["transaction_id"])
+        else:
+            next_cursor = encode_sequence_cursor(since_seq, since_id)
+        return {"changes": changes, "next_cursor": next_cursor, "has_more": has_more}
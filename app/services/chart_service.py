@@ -0,0 +1,184 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional
+from fastapi import HTTPException
+from app.utils.artifact_cache import content_key, get_artifact_cache
+from .svg_charts import render_bar_chart_svg, render_pie_chart_svg
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHART_RENDER_WORKERS = int(os.getenv("CHART_RENDER_WORKERS", os.cpu_count() or 2))
+CHART_RENDER_MAX_PENDING = int(os.getenv("CHART_RENDER_MAX_PENDING", max(CHART_RENDER_WORKERS, 1) * 4))
+CHART_RENDER_TIMEOUT = float(os.getenv("CHART_RENDER_TIMEOUT", "30"))
+CHART_RENDERER = os.getenv("CHART_RENDERER", "matplotlib")  # "matplotlib" (PNG en el pool) o "svg" (en proceso)
+CHART_VERSION = "1"  # Cambiarlo cuando cambie el diseño de los gráficos invalida la caché
+
+
+def _init_worker() -> None:
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def render_bar_chart(path: str, categories: List[str], recommended_values: List[float], actual_values: List[float]) -> str:
+    """Gráfico de barras recomendado vs. real. Usa la API de Figure, sin el estado global de pyplot."""
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(10, 6))
+    axes = figure.subplots()
+    bar_width = 0.35
+    x = range(len(categories))
+    axes.bar([i - bar_width / 2 for i in x], recommended_values, bar_width, label="Recomendado", color="skyblue")
+    axes.bar([i + bar_width / 2 for i in x], actual_values, bar_width, label="Real", color="salmon")
+    axes.set_xlabel("Categorías")
+    axes.set_ylabel("Monto (COP)")
+    axes.set_title("Comparación de Presupuesto Recomendado vs. Real")
+    axes.set_xticks(list(x))
+    axes.set_xticklabels(categories, rotation=45)
+    axes.legend()
+    figure.tight_layout()
+    figure.savefig(path)
+    return path
+
+
+def render_pie_chart(path: str, labels: List[str], values: List[float]) -> str:
+    """Gráfico circular de la distribución de gastos reales."""
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(8, 8))
+    axes = figure.subplots()
+    axes.pie(
+        values,
+        labels=labels,
+        autopct="%1.1f%%",
+        startangle=140,
+        colors=['#ff9999', '#66b3ff', '#99ff99', '#ffcc99']
+    )
+    axes.set_title("Distribución de Gastos Reales")
+    figure.savefig(path)
+    return path
+
+
+class ChartRenderService:
+    """Renderiza los gráficos en un pool de procesos con cola acotada y tiempo máximo por gráfico."""
+
+    def __init__(self, workers: int = CHART_RENDER_WORKERS, max_pending: int = CHART_RENDER_MAX_PENDING, timeout: float = CHART_RENDER_TIMEOUT):
+        self.executor = None
+        if workers > 0:
+            # spawn evita heredar hilos y locks del servidor en los procesos hijos
+            self.executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+        else:
+            # Con 0 workers se renderiza en el proceso actual (p. ej. dentro de los workers del batch de fin de mes)
+            _init_worker()
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.timeout = timeout
+
+    def submit(self, function, *args):
+        if not self.slots.acquire(blocking=False):
+            logger.warning("Cola de renderizado de gráficos llena")
+            raise HTTPException(status_code=503, detail="El servicio de gráficos está ocupado, intenta de nuevo")
+        try:
+            if self.executor is None:
+                future = Future()
+                try:
+                    future.set_result(function(*args))
+                except Exception as e:
+                    future.set_exception(e)
+            else:
+                future = self.executor.submit(function, *args)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def wait(self, future):
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            logger.error(f"El renderizado de un gráfico superó {self.timeout}s")
+            raise HTTPException(status_code=504, detail="Tiempo agotado al generar los gráficos")
+
+    def render_report_charts(self, categories: List[str], recommended_values: List[float],
+                             actual_values: List[float], by_category: Dict[str, float]) -> Dict[str, Optional[str]]:
+        """Devuelve las rutas de ambos gráficos del reporte, renderizando en paralelo solo los que no están en caché."""
+        cache = get_artifact_cache()
+        requests = {
+            "bar_chart": (content_key("bar_chart", CHART_VERSION, categories, recommended_values, actual_values),
+                          render_bar_chart, (categories, recommended_values, actual_values))
+        }
+        if by_category:
+            requests["pie_chart"] = (content_key("pie_chart", CHART_VERSION, by_category),
+                                     render_pie_chart, (list(by_category.keys()), list(by_category.values())))
+
+        charts = {"bar_chart": None, "pie_chart": None}
+        pending = {}
+        for name, (key, function, args) in requests.items():
+            charts[name] = cache.get(key, ".png")
+            if charts[name] is None:
+                temp_path = cache.temp_path(key, ".png")
+                pending[name] = (key, temp_path, self.submit(function, temp_path, *args))
+        for name, (key, temp_path, future) in pending.items():
+            try:
+                self.wait(future)
+            except Exception:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            charts[name] = cache.commit(temp_path, key, ".png")
+        return charts
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_service: Optional[ChartRenderService] = None
+_service_lock = threading.Lock()
+
+
+def get_chart_render_service() -> ChartRenderService:
+    """El pool se crea al primer uso para no lanzar procesos al importar el módulo."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ChartRenderService()
+            atexit.register(_service.shutdown)
+        return _service
+
+
+def _write_text(path: str, content: str) -> str:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return path
+
+
+def render_report_charts(categories: List[str], recommended_values: List[float],
+                         actual_values: List[float], by_category: Dict[str, float]) -> Dict[str, Optional[str]]:
+    """Genera los gráficos del reporte con el renderizador configurado en CHART_RENDERER."""
+    if CHART_RENDERER != "svg":
+        return get_chart_render_service().render_report_charts(categories, recommended_values, actual_values, by_category)
+
+    # El SVG se arma como texto en milisegundos: no necesita matplotlib ni el pool de procesos
+    cache = get_artifact_cache()
+    bar_key = content_key("bar_chart_svg", CHART_VERSION, categories, recommended_values, actual_values)
+    charts = {
+        "bar_chart": cache.get_or_create(bar_key, ".svg", lambda path: _write_text(
+            path, render_bar_chart_svg(categories, recommended_values, actual_values)
+        )),
+        "pie_chart": None
+    }
+    if by_category:
+        pie_key = content_key("pie_chart_svg", CHART_VERSION, by_category)
+        charts["pie_chart"] = cache.get_or_create(pie_key, ".svg", lambda path: _write_text(
+            path, render_pie_chart_svg(list(by_category.keys()), list(by_category.values()))
+        ))
+    return charts
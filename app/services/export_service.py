@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+import zlib
+from typing import Iterable, Iterator, Optional
+from app.database import SessionLocal
+from app.schemas.transaction import TransactionFilter
+from .transaction_service import TransactionService
+
+EXPORT_COLUMNS = ["id", "type", "amount", "category", "description", "created_at"]
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8"
+}
+# Tamaño aproximado de cada bloque enviado al cliente
+FLUSH_SIZE = 64 * 1024
+
+
+def _row_to_dict(row) -> dict:
+    return {
+        "id": row.id,
+        "type": row.type,
+        "amount": float(row.amount) if row.amount is not None else None,
+        "category": row.category,
+        "description": row.description,
+        "created_at": row.created_at.isoformat() if row.created_at else None
+    }
+
+
+def encode_ndjson(rows: Iterable) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(_row_to_dict(row), ensure_ascii=False) + "\n"
+
+
+def encode_csv(rows: Iterable) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(_row_to_dict(row))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def _batch(lines: Iterable[str]) -> Iterator[bytes]:
+    """Agrupa las líneas en bloques de ~FLUSH_SIZE bytes para no enviar un fragmento por fila."""
+    pending = []
+    size = 0
+    for line in lines:
+        encoded = line.encode("utf-8")
+        pending.append(encoded)
+        size += len(encoded)
+        if size >= FLUSH_SIZE:
+            yield b"".join(pending)
+            pending = []
+            size = 0
+    if pending:
+        yield b"".join(pending)
+
+
+def _gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # 31 = formato gzip
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_transactions(user_id: int, filters: Optional[TransactionFilter], fmt: str, compress: bool = False) -> Iterator[bytes]:
+    """Genera la exportación por bloques. Abre su propia sesión porque se consume después de que la ruta retorna."""
+    db = SessionLocal()
+    try:
+        rows = TransactionService(db).iter_transaction_rows(user_id, filters)
+        lines = encode_csv(rows) if fmt == "csv" else encode_ndjson(rows)
+        chunks = _batch(lines)
+        if compress:
+            chunks = _gzip(chunks)
+        yield from chunks
+    finally:
+        db.close()
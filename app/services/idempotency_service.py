@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.idempotency_key import IdempotencyKey
+import logging
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL = timedelta(hours=24)
+# Una reserva 'pending' confirmada (p. ej. de versiones anteriores) sin avances durante este tiempo se considera huérfana
+IDEMPOTENCY_LEASE = timedelta(seconds=int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "60")))
+
+
+def _hash(value: Any) -> str:
+    canonical = json.dumps(jsonable_encoder(value), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class IdempotencyService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def run(self, user_id: int, key: Optional[str], method: str, path: str, payload: Any, operation: Callable[[], Any],
+            after_commit: Optional[Callable[[], None]] = None):
+        """Ejecuta operation una sola vez por Idempotency-Key; los reintentos reciben la respuesta guardada.
+
+        operation debe dejar sus cambios sin commit: la reserva de la clave, la escritura y la respuesta guardada
+        se confirman en un solo commit, así que una caída a mitad de camino no deja la clave reservada.
+        """
+        if not key:
+            result = operation()
+            self.db.commit()
+            if after_commit:
+                after_commit()
+            return result
+
+        request_hash = _hash({"method": method, "path": path, "payload": payload})
+        record = self._claim(user_id, key, method, path, request_hash)
+        if record.status == "completed":
+            logger.info(f"Respuesta repetida para Idempotency-Key {key} del usuario {user_id}")
+            return JSONResponse(
+                content=record.response_body,
+                status_code=record.status_code,
+                headers={"Idempotent-Replayed": "true"}
+            )
+
+        try:
+            body = jsonable_encoder(operation())
+            record.status = "completed"
+            record.status_code = 200
+            record.response_body = body
+            record.response_hash = _hash(body)
+            record.updated_at = datetime.utcnow()
+            self.db.commit()
+        except Exception:
+            # Se descarta todo, también la reserva: el cliente puede reintentar con la misma clave
+            self.db.rollback()
+            raise
+        if after_commit:
+            after_commit()
+        return JSONResponse(content=body, status_code=200)
+
+    def _claim(self, user_id: int, key: str, method: str, path: str, request_hash: str) -> IdempotencyKey:
+        """Reserva la clave como 'pending' sin hacer commit, o devuelve el registro existente si ya fue usada.
+
+        Mientras la petición que la reservó no termina, otra con la misma clave espera en el índice único.
+        Una reserva 'pending' ya confirmada cuyo updated_at supera IDEMPOTENCY_LEASE quedó huérfana y se retoma.
+        """
+        now = datetime.utcnow()
+        self._purge_expired(user_id, now)
+        record = IdempotencyKey(
+            user_id=user_id,
+            idempotency_key=key,
+            method=method,
+            path=path,
+            request_hash=request_hash,
+            status="pending",
+            updated_at=now,
+            expires_at=now + IDEMPOTENCY_TTL
+        )
+        self.db.add(record)
+        try:
+            self.db.flush()
+            return record
+        except IntegrityError:
+            self.db.rollback()
+
+        existing = self.db.query(IdempotencyKey).filter(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.idempotency_key == key
+        ).first()
+        if existing is None:
+            raise HTTPException(status_code=409, detail="Conflicto al registrar la Idempotency-Key, intenta de nuevo")
+        if existing.request_hash != request_hash:
+            raise HTTPException(status_code=422, detail="La Idempotency-Key ya se usó con una petición diferente")
+        if existing.status == "pending":
+            if existing.updated_at is None or existing.updated_at > now - IDEMPOTENCY_LEASE:
+                raise HTTPException(status_code=409, detail="Una petición con esta Idempotency-Key aún está en proceso")
+            # Compare-and-swap sobre updated_at: solo una de las peticiones que lo intenten se queda con la reserva
+            taken = self.db.execute(update(IdempotencyKey).where(
+                IdempotencyKey.id == existing.id,
+                IdempotencyKey.status == "pending",
+                IdempotencyKey.updated_at == existing.updated_at
+            ).values(updated_at=now, expires_at=now + IDEMPOTENCY_TTL)).rowcount
+            if taken != 1:
+                self.db.rollback()
+                raise HTTPException(status_code=409, detail="Una petición con esta Idempotency-Key aún está en proceso")
+            logger.warning(f"Reserva huérfana de la Idempotency-Key {key} del usuario {user_id} retomada")
+            self.db.refresh(existing)
+        return existing
+
+    def _purge_expired(self, user_id: int, now: datetime) -> None:
+        self.db.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.expires_at < now
+        ))
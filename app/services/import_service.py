@@ -0,0 +1,295 @@
+import csv
+import io
+import itertools
+import os
+import re
+import shutil
+import unicodedata
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional
+from dateutil import parser as date_parser
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.import_job import ImportJob
+from app.schemas.transaction import CategoryEnum
+from app.utils.text_index import invalidate_user_index
+from .transaction_service import TransactionService
+import logging
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IMPORT_DIR = os.getenv("IMPORT_DIR", "imports")
+IMPORT_CHUNK_SIZE = 1000
+# Un trabajo 'running' sin avances (updated_at se actualiza con cada bloque) durante este tiempo quedó huérfano
+IMPORT_JOB_STALE_AFTER = timedelta(minutes=int(os.getenv("IMPORT_JOB_STALE_MINUTES", "15")))
+COPY_BUFFER_SIZE = 1024 * 1024
+
+SUPPORTED_FORMATS = {".csv": "csv", ".ofx": "ofx", ".qfx": "ofx"}
+
+# Nombres de columna aceptados en el CSV para cada campo de Transaction
+CSV_COLUMN_ALIASES = {
+    "created_at": ["date", "fecha", "created_at"],
+    "amount": ["amount", "monto", "valor", "importe"],
+    "type": ["type", "tipo"],
+    "category": ["category", "categoria"],
+    "description": ["description", "descripcion", "concepto", "detalle"]
+}
+
+TYPE_ALIASES = {
+    "income": "income", "ingreso": "income", "credit": "income", "credito": "income",
+    "expense": "expense", "gasto": "expense", "debit": "expense", "debito": "expense"
+}
+
+OFX_TAG_PATTERN = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+
+def _normalize(text: str) -> str:
+    """Pasa a minúsculas y elimina tildes para comparar nombres de columnas y categorías."""
+    decomposed = unicodedata.normalize("NFKD", text.strip().lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+_CATEGORY_LOOKUP = {_normalize(category.value): category.value for category in CategoryEnum}
+
+
+def map_category(raw: Optional[str]) -> str:
+    """Convierte una categoría libre en un valor de CategoryEnum, usando 'Otros' si no coincide."""
+    if not raw:
+        return CategoryEnum.OTROS.value
+    return _CATEGORY_LOOKUP.get(_normalize(raw), CategoryEnum.OTROS.value)
+
+
+def parse_amount(raw: str) -> float:
+    """Interpreta montos como '1.234,56', '1,234.56' o '-45000'."""
+    value = raw.strip().replace("$", "").replace(" ", "")
+    if "," in value and "." in value:
+        if value.rfind(",") > value.rfind("."):
+            value = value.replace(".", "").replace(",", ".")
+        else:
+            value = value.replace(",", "")
+    elif "," in value:
+        integer, _, decimals = value.rpartition(",")
+        value = f"{integer.replace(',', '')}.{decimals}" if len(decimals) <= 2 else value.replace(",", "")
+    return float(value)
+
+
+def parse_date(raw: str) -> datetime:
+    """Acepta fechas ISO y, si no lo son, fechas locales día/mes/año."""
+    try:
+        return datetime.fromisoformat(raw.strip())
+    except ValueError:
+        return date_parser.parse(raw, dayfirst=True)
+
+
+def parse_ofx_date(raw: str) -> datetime:
+    """Las fechas OFX tienen la forma AAAAMMDD[HHMMSS[.XXX]][zona]."""
+    digits = raw.strip()[:14]
+    return datetime.strptime(digits, "%Y%m%d%H%M%S" if len(digits) == 14 else "%Y%m%d")
+
+
+def iter_csv_records(stream) -> Iterator[dict]:
+    """Genera un diccionario por fila del CSV sin cargar el archivo completo en memoria."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    header_line = text.readline()
+    delimiter = max(",;\t", key=header_line.count)
+    header = next(csv.reader([header_line], delimiter=delimiter))
+    columns = {}
+    for position, name in enumerate(header):
+        for field, aliases in CSV_COLUMN_ALIASES.items():
+            if _normalize(name) in aliases and field not in columns:
+                columns[field] = position
+    if "amount" not in columns or "created_at" not in columns:
+        raise ValueError("El CSV debe tener al menos las columnas de fecha y monto")
+
+    for row in csv.reader(text, delimiter=delimiter):
+        if not any(cell.strip() for cell in row):
+            continue
+        yield {field: row[position] if position < len(row) else "" for field, position in columns.items()}
+
+
+def iter_ofx_records(stream) -> Iterator[dict]:
+    """Genera un diccionario por cada bloque <STMTTRN> de un extracto OFX/QFX."""
+    text = io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+    current = None
+    for line in text:
+        for match in OFX_TAG_PATTERN.finditer(line):
+            closing, tag, value = match.group(1), match.group(2).upper(), match.group(3).strip()
+            if tag == "STMTTRN":
+                if closing and current is not None:
+                    yield current
+                    current = None
+                elif not closing:
+                    current = {}
+            elif current is not None and not closing and value:
+                current[tag] = value
+
+
+def csv_record_to_row(record: dict, user_id: int) -> dict:
+    amount = parse_amount(record["amount"])
+    raw_type = _normalize(record.get("type") or "")
+    if raw_type:
+        if raw_type not in TYPE_ALIASES:
+            raise ValueError(f"Tipo inválido: {record['type']}")
+        transaction_type = TYPE_ALIASES[raw_type]
+    else:
+        transaction_type = "expense" if amount < 0 else "income"
+    return {
+        "user_id": user_id,
+        "type": transaction_type,
+        "amount": abs(amount),
+        "category": map_category(record.get("category")),
+        "description": (record.get("description") or "").strip()[:255] or None,
+        "created_at": parse_date(record["created_at"])
+    }
+
+
+def ofx_record_to_row(record: dict, user_id: int) -> dict:
+    amount = parse_amount(record["TRNAMT"])
+    description = " - ".join(part for part in (record.get("NAME"), record.get("MEMO")) if part)
+    return {
+        "user_id": user_id,
+        "type": "expense" if amount < 0 else "income",
+        "amount": abs(amount),
+        "category": map_category(None),
+        "description": description[:255] or None,
+        "created_at": parse_ofx_date(record["DTPOSTED"])
+    }
+
+
+PARSERS = {
+    "csv": (iter_csv_records, csv_record_to_row),
+    "ofx": (iter_ofx_records, ofx_record_to_row)
+}
+
+
+class ImportService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def create_job(self, upload: UploadFile, user_id: int) -> ImportJob:
+        """Copia el archivo subido a disco por bloques y registra el trabajo de importación."""
+        extension = os.path.splitext(upload.filename or "")[1].lower()
+        if extension not in SUPPORTED_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Formato no soportado. Usa uno de {list(SUPPORTED_FORMATS)}")
+
+        os.makedirs(IMPORT_DIR, exist_ok=True)
+        file_path = os.path.join(IMPORT_DIR, f"{uuid.uuid4().hex}{extension}")
+        with open(file_path, "wb") as destination:
+            shutil.copyfileobj(upload.file, destination, COPY_BUFFER_SIZE)
+
+        job = ImportJob(
+            user_id=user_id,
+            filename=upload.filename[:255],
+            file_path=file_path,
+            format=SUPPORTED_FORMATS[extension],
+            status="pending",
+            processed_rows=0,
+            imported_rows=0,
+            failed_rows=0
+        )
+        self.db.add(job)
+        self.db.commit()
+        self.db.refresh(job)
+        logger.info(f"Trabajo de importación {job.id} creado por usuario {user_id}")
+        return job
+
+    def get_job(self, job_id: int, user_id: int) -> ImportJob:
+        job = self.db.query(ImportJob).filter(
+            ImportJob.id == job_id,
+            ImportJob.user_id == user_id
+        ).first()
+        if not job:
+            raise HTTPException(status_code=404, detail="Trabajo de importación no encontrado")
+        return job
+
+    def prepare_resume(self, job_id: int, user_id: int) -> ImportJob:
+        job = self.get_job(job_id, user_id)
+        stale_running = job.status == "running" and self._is_stale(job)
+        if job.status not in ("failed", "pending") and not stale_running:
+            raise HTTPException(status_code=409, detail=f"El trabajo está en estado '{job.status}' y no se puede reanudar")
+        if not os.path.exists(job.file_path):
+            raise HTTPException(status_code=410, detail="El archivo de la importación ya no está disponible")
+        if stale_running:
+            last_update, processed_rows = job.updated_at, job.processed_rows
+            # Compare-and-swap sobre updated_at: si dos peticiones lo reanudan a la vez, solo una lo retoma
+            taken = self.db.execute(update(ImportJob).where(
+                ImportJob.id == job.id,
+                ImportJob.status == "running",
+                ImportJob.updated_at == job.updated_at
+            ).values(status="pending", error="Reanudado tras quedar sin avances")).rowcount
+            self.db.commit()
+            if taken != 1:
+                raise HTTPException(status_code=409, detail="El trabajo está en estado 'running' y no se puede reanudar")
+            logger.warning(f"Importación {job.id} sin avances desde {last_update}; se reanuda desde el registro {processed_rows}")
+            self.db.refresh(job)
+        return job
+
+    @staticmethod
+    def _is_stale(job: ImportJob) -> bool:
+        last_update = job.updated_at or job.created_at
+        if last_update is None:
+            return False
+        if last_update.tzinfo is None:
+            last_update = last_update.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - last_update > IMPORT_JOB_STALE_AFTER
+
+    def run_job(self, job_id: int) -> ImportJob:
+        """Procesa el archivo desde el último bloque confirmado, haciendo commit cada IMPORT_CHUNK_SIZE registros."""
+        job = self.db.query(ImportJob).filter(ImportJob.id == job_id).first()
+        if not job:
+            raise ValueError(f"Trabajo de importación {job_id} no encontrado")
+
+        job.status = "running"
+        job.error = None
+        self.db.commit()
+
+        iter_records, record_to_row = PARSERS[job.format]
+        transaction_service = TransactionService(self.db)
+        try:
+            with open(job.file_path, "rb") as stream:
+                records = itertools.islice(iter_records(stream), job.processed_rows, None)
+                while True:
+                    chunk = list(itertools.islice(records, IMPORT_CHUNK_SIZE))
+                    if not chunk:
+                        break
+                    rows = []
+                    for record in chunk:
+                        try:
+                            rows.append(record_to_row(record, job.user_id))
+                        except (ValueError, KeyError, OverflowError) as e:
+                            job.failed_rows += 1
+                            logger.warning(f"Registro inválido en importación {job.id}: {e}")
+                    transaction_service.insert_transaction_rows(rows)
+                    # El offset avanza en la misma transacción que las filas insertadas
+                    job.processed_rows += len(chunk)
+                    job.imported_rows += len(rows)
+                    self.db.commit()
+                    invalidate_user_index(job.user_id)
+                    logger.info(f"Importación {job.id}: {job.processed_rows} registros procesados")
+        except Exception as e:
+            self.db.rollback()
+            job.status = "failed"
+            job.error = str(e)[:255]
+            self.db.commit()
+            logger.error(f"Importación {job.id} fallida en el registro {job.processed_rows}: {e}")
+            return job
+
+        job.status = "completed"
+        self.db.commit()
+        os.remove(job.file_path)
+        logger.info(f"Importación {job.id} completada: {job.imported_rows} importados, {job.failed_rows} fallidos")
+        return job
+
+
+def run_import_job(job_id: int) -> None:
+    """Punto de entrada para tareas en segundo plano: usa su propia sesión de base de datos."""
+    db = SessionLocal()
+    try:
+        ImportService(db).run_job(job_id)
+    finally:
+        db.close()
@@ -0,0 +1,72 @@
+from typing import List
+from fpdf import FPDF
+
+NATIVE_PDF_VERSION = "1"  # Cambiarlo cuando cambie el diseño del PDF invalida la caché
+
+
+def _text(value) -> str:
+    """Las fuentes estándar de PDF solo cubren latin-1; otros caracteres se sustituyen."""
+    return str(value).encode("latin-1", "replace").decode("latin-1")
+
+
+def _money(value: float) -> str:
+    return f"${value:,.0f}"
+
+
+def _table(pdf: FPDF, header: List[str], rows: List[List[str]], widths: List[int]) -> None:
+    pdf.set_font("Helvetica", "B", 10)
+    pdf.set_fill_color(230, 230, 230)
+    for title, width in zip(header, widths):
+        pdf.cell(width, 8, _text(title), border=1, fill=True, align="C")
+    pdf.ln()
+    pdf.set_font("Helvetica", "", 10)
+    for row in rows:
+        for index, (value, width) in enumerate(zip(row, widths)):
+            pdf.cell(width, 7, _text(value), border=1, align="L" if index == 0 else "R")
+        pdf.ln()
+
+
+def render_report_pdf(report_data: dict) -> bytes:
+    """Genera en memoria el PDF del reporte con el mismo contenido que la plantilla LaTeX."""
+    analysis = report_data["analysis"]
+    pdf = FPDF(format="A4")
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+
+    pdf.set_font("Helvetica", "B", 16)
+    pdf.cell(0, 10, _text("Reporte de Presupuesto Mensual"), align="C", new_x="LMARGIN", new_y="NEXT")
+    pdf.set_font("Helvetica", "", 11)
+    pdf.cell(0, 8, _text(f"Periodo: {report_data['period']}"), align="C", new_x="LMARGIN", new_y="NEXT")
+    pdf.ln(4)
+
+    pdf.set_font("Helvetica", "B", 13)
+    pdf.cell(0, 8, _text("Resumen"), new_x="LMARGIN", new_y="NEXT")
+    _table(pdf, ["Concepto", "Valor"], [
+        ["Total recomendado", _money(analysis["total_recommended"])],
+        ["Total real", _money(analysis["total_actual"])],
+        ["Diferencia", _money(analysis["difference"])],
+        ["Estado", analysis["status"]]
+    ], [95, 95])
+    pdf.ln(4)
+
+    pdf.set_font("Helvetica", "B", 13)
+    pdf.cell(0, 8, _text("Desviaciones por categoría"), new_x="LMARGIN", new_y="NEXT")
+    _table(pdf, ["Categoría", "Recomendado", "Real", "Desviación"], [
+        [category, _money(data["recommended"]), _money(data["actual"]), _money(data["deviation"])]
+        for category, data in analysis["deviations"].items()
+    ], [70, 40, 40, 40])
+    pdf.ln(4)
+
+    pdf.set_font("Helvetica", "B", 13)
+    pdf.cell(0, 8, _text("Recomendaciones"), new_x="LMARGIN", new_y="NEXT")
+    pdf.set_font("Helvetica", "", 10)
+    for recommendation in report_data["recommendations"]:
+        pdf.multi_cell(0, 6, _text(f"- {recommendation.lstrip('- ')}"), new_x="LMARGIN", new_y="NEXT")
+
+    charts = report_data.get("charts") or {}
+    for chart in (charts.get("bar_chart"), charts.get("pie_chart")):
+        if chart:
+            pdf.add_page()
+            pdf.image(chart, x=pdf.l_margin, w=pdf.epw)
+
+    return bytes(pdf.output())
@@ -1,11 +1,24 @@
+from sqlalchemy import Date, Numeric, delete, exists, func, insert, literal, select
+from sqlalchemy.exc import IntegrityError, OperationalError
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.orm.exc import StaleDataError
 from typing import Optional
+from decimal import Decimal
+from itertools import islice
+import os
 from app.schemas.questionnaire import QuestionnaireCreate, MonthlyReportUpdate, ExpenseEntry
-from app.models.transaction import Transaction
+from app.services.transaction_service import TransactionService
 from fastapi import HTTPException
 from datetime import date
 from app.schemas.transaction import CategoryEnum
-from sqlalchemy.orm.attributes import flag_modified
+from app.utils.recommendation_cache import invalidate_questionnaire_recommendations
+from app.utils.etag import PRECONDITION_FAILED_DETAIL, check_if_match, commit_versioned, format_etag
+
+MAX_APPEND_RETRIES = 5
+# MySQL: 1213 = deadlock (víctima abortada), 1205 = lock wait timeout. Ambos dejan la transacción lista para reintentar
+LOCK_CONFLICT_ERRORS = (1213, 1205)
+SYNC_BATCH_SIZE = int(os.getenv("QUESTIONNAIRE_SYNC_BATCH_SIZE", "1000"))  # Filas por lote al leer e insertar entradas
 
 class QuestionnaireService:
     def __init__(self, db: Session):
@@ -49,15 +62,20 @@ class QuestionnaireService:
             ans1=questionnaire.ans1,
             ans2=questionnaire.ans2,
             ans3=questionnaire.ans3,
-            ans4=questionnaire.ans4,
-            monthly_report=questionnaire.monthly_report
+            ans4=questionnaire.ans4
         )
         self.db.add(db_questionnaire)
+        self.db.flush()
+        self.set_monthly_report(db_questionnaire, questionnaire.monthly_report)
         self.db.commit()
         self.db.refresh(db_questionnaire)
         return db_questionnaire
 
-    def update_monthly_report(self, questionnaire_id: int, user_id: int, update: MonthlyReportUpdate):
+    def get_etag(self, questionnaire) -> str:
+        """La versión cubre los reemplazos completos; el último seq cubre las entradas anexadas."""
+        return format_etag(questionnaire.version, self._last_seq(questionnaire.id))
+
+    def update_monthly_report(self, questionnaire_id: int, user_id: int, update: MonthlyReportUpdate, if_match: Optional[str] = None):
         from app.models.questionnaire import Questionnaire
         questionnaire = self.db.query(Questionnaire).filter(
             Questionnaire.id == questionnaire_id,
@@ -66,29 +84,29 @@ class QuestionnaireService:
 
         if not questionnaire:
             raise HTTPException(status_code=404, detail="Cuestionario no encontrado o no pertenece al usuario")
+        check_if_match(if_match, self.get_etag(questionnaire))
 
-        # Inicializar monthly_report si es None
-        if questionnaire.monthly_report is None:
-            questionnaire.monthly_report = {"entries": [], "total": 0.0}
-
-        # Asegurarse de que entries es una lista
-        if not isinstance(questionnaire.monthly_report.get("entries"), list):
-            questionnaire.monthly_report["entries"] = []
-
-        # Añadir el nuevo gasto
+        # Anexar es un INSERT de una fila: ni se lee ni se reescribe el reporte completo
+        self._migrate_legacy_report(questionnaire)
         expense_dict = update.expense.dict()
+        expense_dict["category"] = update.expense.category.value
         expense_dict["date"] = date.today().isoformat()
-        questionnaire.monthly_report["entries"].append(expense_dict)
-        questionnaire.monthly_report["total"] = questionnaire.monthly_report.get("total", 0.0) + update.expense.amount
-
-        # Marcar el campo monthly_report como modificado
-        flag_modified(questionnaire, "monthly_report")
-
-        self.db.commit()
-        self.db.refresh(questionnaire)
+        if if_match:
+            # Con If-Match la entrada solo se anexa sobre el estado validado; si otra escritura ganó, 412 sin reintentar
+            self._append_entry_if_unchanged(questionnaire, expense_dict)
+        else:
+            self._append_entry(questionnaire.id, expense_dict)
+        invalidate_questionnaire_recommendations(questionnaire.id)
         return questionnaire
 
-    def sync_questionnaire_with_transactions(self, questionnaire_id: int, user_id: int, start_date: date, end_date: date):
+    def sync_questionnaire_with_transactions(self, questionnaire_id: int, user_id: int, start_date: date, end_date: date,
+                                             mode: str = "detailed", if_match: Optional[str] = None) -> dict:
+        """Reemplaza el reporte mensual con los gastos de [start_date, end_date) y devuelve el resumen del periodo.
+
+        El total y las sumas por categoría siempre se calculan en la base de datos. En modo summary se guarda una
+        entrada por categoría; en modo detailed, una por transacción, leídas con yield_per e insertadas por lotes.
+        En ambos casos la memoria usada no depende del tamaño de la ventana.
+        """
         from app.models.questionnaire import Questionnaire
         questionnaire = self.db.query(Questionnaire).filter(
             Questionnaire.id == questionnaire_id,
@@ -97,28 +115,195 @@ class QuestionnaireService:
 
         if not questionnaire:
             raise HTTPException(status_code=404, detail="Cuestionario no encontrado o no pertenece al usuario")
+        check_if_match(if_match, self.get_etag(questionnaire))
 
-        transactions = self.db.query(Transaction).filter(
-            Transaction.user_id == user_id,
-            Transaction.created_at >= start_date,
-            Transaction.created_at < end_date,
-            Transaction.type.lower() == "expense"
-        ).all()
-
-        questionnaire.monthly_report = {"entries": [], "total": 0.0}
-        for transaction in transactions:
-            expense_entry = {
-                "category": transaction.category,
-                "amount": float(transaction.amount),
-                "description": transaction.description,
-                "date": transaction.created_at.date().isoformat()
-            }
-            questionnaire.monthly_report["entries"].append(expense_entry)
-            questionnaire.monthly_report["total"] += float(transaction.amount)
-
-        # Marcar el campo monthly_report como modificado
-        flag_modified(questionnaire, "monthly_report")
+        by_category = {
+            category: float(amount)
+            for category, amount in TransactionService(self.db).expense_window_totals(user_id, start_date, end_date)
+        }
+        if mode == "summary":
+            entries = [
+                {"category": category, "amount": amount, "description": "Total del periodo", "date": start_date.isoformat()}
+                for category, amount in by_category.items()
+            ]
+            self.set_monthly_report(questionnaire, {"entries": entries})
+        else:
+            # pymysql no admite otras consultas en una conexión con un cursor sin búfer abierto: se lee con otra sesión
+            reader = Session(bind=self.db.get_bind())
+            try:
+                rows = TransactionService(reader).iter_expense_window_rows(user_id, start_date, end_date, SYNC_BATCH_SIZE)
+                entries = (
+                    {
+                        "category": category,
+                        "amount": amount,
+                        "description": description,
+                        "date": created_at.date().isoformat()
+                    }
+                    for category, amount, description, created_at in rows
+                )
+                self.set_monthly_report(questionnaire, {"entries": entries})
+            finally:
+                reader.close()
 
-        self.db.commit()
-        self.db.refresh(questionnaire)
-        return questionnaire
\ No newline at end of file
+        commit_versioned(self.db)
+        invalidate_questionnaire_recommendations(questionnaire.id)
+        entry_count = self._last_seq(questionnaire.id)
+        return {
+            "questionnaire_id": questionnaire.id,
+            "mode": mode,
+            "entries": entry_count,
+            "total": sum(by_category.values()),
+            "by_category": by_category,
+            "etag": format_etag(questionnaire.version, entry_count)
+        }
+
+    def set_monthly_report(self, questionnaire, monthly_report: Optional[dict]) -> None:
+        """Reemplaza todas las entradas del reporte mensual. No hace commit.
+
+        El total se recalcula como acumulado de las entradas; el 'total' recibido no se usa. Las entradas pueden
+        venir de un generador: se insertan por lotes de SYNC_BATCH_SIZE sin armar la lista completa.
+        """
+        from app.models.questionnaire_expense_entry import QuestionnaireExpenseEntry
+        self.db.execute(delete(QuestionnaireExpenseEntry).where(
+            QuestionnaireExpenseEntry.questionnaire_id == questionnaire.id
+        ))
+        entries = enumerate((monthly_report or {}).get("entries") or [], start=1)
+        running_total = Decimal("0")
+        inserted = 0
+        while True:
+            rows = []
+            for seq, entry in islice(entries, SYNC_BATCH_SIZE):
+                amount = Decimal(str(entry.get("amount", 0)))
+                running_total += amount
+                rows.append({
+                    "questionnaire_id": questionnaire.id,
+                    "seq": seq,
+                    "category": entry.get("category"),
+                    "amount": amount,
+                    "running_total": running_total,
+                    "description": entry.get("description"),
+                    "entry_date": self._parse_entry_date(entry.get("date"))
+                })
+            if not rows:
+                break
+            self.db.execute(insert(QuestionnaireExpenseEntry), rows)
+            inserted += len(rows)
+        # Un reporte vacío se conserva como tal; None significa que el cuestionario no tiene reporte
+        questionnaire.monthly_report_data = None if inserted or monthly_report is None else {"entries": [], "total": 0.0}
+        # Un reemplazo siempre incrementa la versión, aunque la columna JSON quede con el mismo valor
+        flag_modified(questionnaire, "monthly_report_data")
+        self.db.expire(questionnaire, ["expense_entries"])
+
+    def _last_seq(self, questionnaire_id: int) -> int:
+        from app.models.questionnaire_expense_entry import QuestionnaireExpenseEntry
+        last_seq = self.db.query(func.max(QuestionnaireExpenseEntry.seq)).filter(
+            QuestionnaireExpenseEntry.questionnaire_id == questionnaire_id
+        ).scalar()
+        return last_seq or 0
+
+    def _append_statement(self, questionnaire_id: int, entry: dict, seq=None, where=None):
+        """INSERT ... SELECT que calcula seq (si no se fija) y el total acumulado en la misma sentencia."""
+        from app.models.questionnaire_expense_entry import QuestionnaireExpenseEntry as Entry
+        amount = Decimal(str(entry["amount"]))
+        if seq is None:
+            seq = select(func.coalesce(func.max(Entry.seq), 0) + 1).where(
+                Entry.questionnaire_id == questionnaire_id
+            ).scalar_subquery()
+        previous_total = select(Entry.running_total).where(
+            Entry.questionnaire_id == questionnaire_id
+        ).order_by(Entry.seq.desc()).limit(1).scalar_subquery()
+        rows = select(
+            literal(questionnaire_id),
+            seq,
+            literal(entry["category"]),
+            literal(amount, Numeric(12, 2)),
+            func.coalesce(previous_total, 0) + literal(amount, Numeric(12, 2)),
+            literal(entry.get("description")),
+            literal(self._parse_entry_date(entry.get("date")), Date)
+        )
+        if where is not None:
+            rows = rows.where(where)
+        return insert(Entry).from_select(
+            ["questionnaire_id", "seq", "category", "amount", "running_total", "description", "entry_date"],
+            rows
+        )
+
+    def _append_entry(self, questionnaire_id: int, entry: dict) -> None:
+        """Anexa la entrada; si otra petición toma el mismo seq, el índice único la rechaza y se reintenta con el siguiente."""
+        statement = self._append_statement(questionnaire_id, entry)
+        for attempt in range(MAX_APPEND_RETRIES):
+            try:
+                self.db.execute(statement)
+                self.db.commit()
+                return
+            except IntegrityError:
+                self.db.rollback()
+            except OperationalError as e:
+                # Bajo REPEATABLE READ el SELECT MAX(seq) toma next-key locks y dos anexos pueden bloquearse entre sí
+                self.db.rollback()
+                if not self._is_lock_conflict(e):
+                    raise
+        raise HTTPException(status_code=409, detail="El reporte mensual está recibiendo muchos cambios, intenta de nuevo")
+
+    def _append_entry_if_unchanged(self, questionnaire, entry: dict) -> None:
+        """Compare-and-swap: el seq se fija al siguiente del leído y la fila solo se inserta si la versión no cambió.
+
+        Una entrada anexada en paralelo choca con el índice único; un reemplazo en paralelo deja el SELECT sin filas.
+        """
+        from app.models.questionnaire import Questionnaire
+        version = questionnaire.version
+        statement = self._append_statement(
+            questionnaire.id,
+            entry,
+            seq=literal(self._last_seq(questionnaire.id) + 1),
+            where=exists().where(Questionnaire.id == questionnaire.id, Questionnaire.version == version)
+        )
+        try:
+            inserted = self.db.execute(statement).rowcount
+            if inserted != 1:
+                raise HTTPException(status_code=412, detail=PRECONDITION_FAILED_DETAIL)
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            raise HTTPException(status_code=412, detail=PRECONDITION_FAILED_DETAIL)
+        except OperationalError as e:
+            self.db.rollback()
+            if not self._is_lock_conflict(e):
+                raise
+            # Otra escritura concurrente compite por el mismo seq
+            raise HTTPException(status_code=412, detail=PRECONDITION_FAILED_DETAIL)
+        except HTTPException:
+            self.db.rollback()
+            raise
+
+    @staticmethod
+    def _is_lock_conflict(error: OperationalError) -> bool:
+        args = getattr(error.orig, "args", ())
+        return bool(args) and args[0] in LOCK_CONFLICT_ERRORS
+
+    def _migrate_legacy_report(self, questionnaire) -> None:
+        """Pasa un monthly_report guardado en el formato JSON anterior a la tabla de entradas, una sola vez."""
+        from app.models.questionnaire_expense_entry import QuestionnaireExpenseEntry
+        if questionnaire.monthly_report_data is None:
+            return
+        has_entries = self.db.query(QuestionnaireExpenseEntry.id).filter(
+            QuestionnaireExpenseEntry.questionnaire_id == questionnaire.id
+        ).first()
+        if has_entries:
+            return
+        try:
+            self.set_monthly_report(questionnaire, questionnaire.monthly_report_data)
+            self.db.commit()
+        except (IntegrityError, StaleDataError):
+            # Otra petición hizo la migración al mismo tiempo
+            self.db.rollback()
+            self.db.refresh(questionnaire)
+
+    @staticmethod
+    def _parse_entry_date(raw) -> Optional[date]:
+        if not raw:
+            return None
+        try:
+            return date.fromisoformat(str(raw)[:10])
+        except ValueError:
+            return None
@@ -0,0 +1,224 @@
+import atexit
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.report_job import ReportJob
+from app.utils.artifact_cache import content_key, get_artifact_cache
+from .budget_service import BudgetService
+from .pdf_renderer import NATIVE_PDF_VERSION, render_report_pdf
+import logging
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REPORT_PDF_BACKEND = os.getenv("REPORT_PDF_BACKEND", "native")  # "native" (fpdf2) o "latex" (latexmk)
+REPORT_TEMPLATE_PATH = "app/templates/budget_report_template.tex"
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "2"))
+# Un trabajo activo sin avances en este tiempo se considera huérfano (p. ej. el servidor se reinició)
+REPORT_JOB_STALE_AFTER = timedelta(minutes=int(os.getenv("REPORT_JOB_STALE_MINUTES", "15")))
+
+
+def build_latex_source(report_data: dict) -> str:
+    """Reemplaza los placeholders de la plantilla LaTeX con los datos del reporte."""
+    if any(path and path.endswith(".svg") for path in report_data["charts"].values()):
+        raise HTTPException(status_code=500, detail="El backend LaTeX requiere gráficos PNG (CHART_RENDERER=matplotlib)")
+    if not os.path.exists(REPORT_TEMPLATE_PATH):
+        raise HTTPException(status_code=500, detail="Plantilla LaTeX no encontrada")
+    with open(REPORT_TEMPLATE_PATH, "r") as f:
+        template = f.read()
+
+    deviations_table = ""
+    for category, data in report_data["analysis"]["deviations"].items():
+        deviations_table += (
+            f"{category} & ${data['recommended']:,.0f} & ${data['actual']:,.0f} & ${data['deviation']:,.0f} \\\\ \n"
+        )
+
+    recommendations_list = ""
+    for rec in report_data["recommendations"]:
+        recommendations_list += f"\\item {rec}\n"
+
+    # latexmk se ejecuta en un directorio temporal: las rutas de los gráficos deben ser absolutas
+    template = template.replace("REPORT_PERIOD", report_data["period"])
+    template = template.replace("RECOMMENDED_TOTAL", f"{report_data['analysis']['total_recommended']:,.0f}")
+    template = template.replace("ACTUAL_TOTAL", f"{report_data['analysis']['total_actual']:,.0f}")
+    template = template.replace("DIFFERENCE", f"{report_data['analysis']['difference']:,.0f}")
+    template = template.replace("STATUS", report_data["analysis"]["status"])
+    template = template.replace("DEVIATIONS_TABLE", deviations_table)
+    template = template.replace("RECOMMENDATIONS_LIST", recommendations_list)
+    template = template.replace("BAR_CHART_PATH", os.path.abspath(report_data["charts"]["bar_chart"]))
+    if report_data["charts"]["pie_chart"]:
+        template = template.replace("PIE_CHART_PATH", os.path.abspath(report_data["charts"]["pie_chart"]))
+        template = template.replace("\\ifdefined\\PIE_CHART_PATH", "")
+        template = template.replace("\\fi", "")
+    else:
+        template = template.replace("\\ifdefined\\PIE_CHART_PATH", "%")
+        template = template.replace("\\fi", "%")
+    return template
+
+
+def compile_latex_pdf(source: str, pdf_path: str) -> str:
+    """Compila el documento con latexmk en un directorio temporal y deja el PDF en pdf_path."""
+    with tempfile.TemporaryDirectory() as work_dir:
+        tex_file_path = os.path.join(work_dir, "report.tex")
+        with open(tex_file_path, "w", encoding="utf-8") as tex_file:
+            tex_file.write(source)
+        try:
+            subprocess.run(
+                ["latexmk", "-pdf", "-interaction=nonstopmode", tex_file_path],
+                check=True,
+                cwd=work_dir,
+                stdout=subprocess.DEVNULL
+            )
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Error al compilar LaTeX: {e}")
+            raise HTTPException(status_code=500, detail="Error al generar el reporte PDF")
+        except FileNotFoundError:
+            logger.error("latexmk no está instalado")
+            raise HTTPException(status_code=500, detail="latexmk no está instalado en el servidor")
+        os.makedirs(os.path.dirname(pdf_path) or ".", exist_ok=True)
+        shutil.move(os.path.join(work_dir, "report.pdf"), pdf_path)
+    logger.info(f"PDF generado en {pdf_path}")
+    return pdf_path
+
+
+def _write_bytes(path: str, content: bytes) -> str:
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+def get_report_pdf(report_data: dict) -> str:
+    """Devuelve la ruta del PDF del reporte en la caché de artefactos, generándolo con el backend configurado.
+
+    El backend nativo arma el PDF en memoria y solo escribe el archivo final; LaTeX queda como alternativa.
+    """
+    cache = get_artifact_cache()
+    if REPORT_PDF_BACKEND == "native":
+        key = content_key("native", NATIVE_PDF_VERSION, report_data)
+        return cache.get_or_create(key, ".pdf", lambda pdf_path: _write_bytes(pdf_path, render_report_pdf(report_data)))
+    if REPORT_PDF_BACKEND == "latex":
+        # Solo se compila si el documento LaTeX resultante cambió
+        source = build_latex_source(report_data)
+        return cache.get_or_create(content_key("latex", source), ".pdf", lambda pdf_path: compile_latex_pdf(source, pdf_path))
+    raise HTTPException(status_code=500, detail=f"Backend de PDF no soportado: {REPORT_PDF_BACKEND}")
+
+
+class ReportJobService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(self, budget_id: int, user_id: int) -> ReportJob:
+        """Crea un trabajo de reporte o devuelve el que ya está pendiente para el mismo presupuesto."""
+        # Valida el presupuesto y el cierre del periodo antes de encolar
+        BudgetService(self.db).get_reportable_budget(budget_id, user_id)
+
+        active_key = f"{user_id}:{budget_id}"
+        existing = self.db.query(ReportJob).filter(ReportJob.active_key == active_key).first()
+        if existing is not None:
+            if not self._is_stale(existing):
+                logger.info(f"Reutilizando trabajo de reporte {existing.id} para presupuesto {budget_id}")
+                return existing
+            existing.status = "failed"
+            existing.error = "El trabajo se abandonó sin terminar"
+            existing.active_key = None
+            self.db.commit()
+
+        job = ReportJob(user_id=user_id, budget_id=budget_id, status="pending", active_key=active_key)
+        self.db.add(job)
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # Otra petición encoló el mismo reporte al mismo tiempo
+            self.db.rollback()
+            job = self.db.query(ReportJob).filter(ReportJob.active_key == active_key).first()
+            if job is None:
+                raise HTTPException(status_code=409, detail="Conflicto al encolar el reporte, intenta de nuevo")
+            return job
+        self.db.refresh(job)
+        get_report_job_executor().submit(run_report_job, job.id)
+        logger.info(f"Trabajo de reporte {job.id} encolado para presupuesto {budget_id}")
+        return job
+
+    def get_job(self, job_id: int, budget_id: int, user_id: int) -> ReportJob:
+        job = self.db.query(ReportJob).filter(
+            ReportJob.id == job_id,
+            ReportJob.budget_id == budget_id,
+            ReportJob.user_id == user_id
+        ).first()
+        if not job:
+            raise HTTPException(status_code=404, detail="Trabajo de reporte no encontrado")
+        return job
+
+    def get_pdf_path(self, job_id: int, budget_id: int, user_id: int) -> str:
+        job = self.get_job(job_id, budget_id, user_id)
+        if job.status == "failed":
+            raise HTTPException(status_code=409, detail=f"La generación del reporte falló: {job.error}")
+        if job.status != "completed":
+            raise HTTPException(status_code=409, detail=f"El reporte aún no está listo (estado: {job.status})")
+        if not job.file_path or not os.path.exists(job.file_path):
+            raise HTTPException(status_code=410, detail="El PDF del reporte ya no está disponible")
+        return job.file_path
+
+    def run_job(self, job_id: int) -> ReportJob:
+        job = self.db.query(ReportJob).filter(ReportJob.id == job_id).first()
+        if job is None:
+            raise ValueError(f"Trabajo de reporte {job_id} no encontrado")
+
+        job.status = "running"
+        self.db.commit()
+        try:
+            report_data = BudgetService(self.db).generate_budget_report(job.budget_id, job.user_id)
+            job.file_path = get_report_pdf(report_data)
+            job.status = "completed"
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error en el trabajo de reporte {job.id}: {e}")
+            job.status = "failed"
+            job.error = str(e.detail if isinstance(e, HTTPException) else e)[:255]
+        job.active_key = None
+        self.db.commit()
+        return job
+
+    @staticmethod
+    def _is_stale(job: ReportJob) -> bool:
+        last_update = job.updated_at or job.created_at
+        if last_update is None:
+            return False
+        if last_update.tzinfo is None:
+            last_update = last_update.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - last_update > REPORT_JOB_STALE_AFTER
+
+
+def run_report_job(job_id: int) -> None:
+    """Punto de entrada del pool de trabajos: usa su propia sesión de base de datos."""
+    db = SessionLocal()
+    try:
+        ReportJobService(db).run_job(job_id)
+    except Exception as e:
+        logger.error(f"No se pudo ejecutar el trabajo de reporte {job_id}: {e}")
+    finally:
+        db.close()
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_report_job_executor() -> ThreadPoolExecutor:
+    """Pool local de trabajos de reporte; los gráficos se delegan además al pool de procesos de chart_service."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=REPORT_JOB_WORKERS, thread_name_prefix="report-job")
+            atexit.register(_executor.shutdown, wait=False)
+        return _executor
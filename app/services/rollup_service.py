@@ -0,0 +1,133 @@
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import delete, func, insert, select, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from app.models.transaction import Transaction
+from app.models.transaction_rollup import TransactionRollup
+
+DEFAULT_CATEGORY = "Otros"
+
+
+def month_start(value: datetime) -> date:
+    return value.date().replace(day=1) if isinstance(value, datetime) else value.replace(day=1)
+
+
+def month_start_expression(db: Session):
+    """Primer día del mes de created_at como DATE, según el motor de base de datos."""
+    if db.bind.dialect.name == "sqlite":
+        return func.date(Transaction.created_at, "start of month")
+    return func.date(func.date_format(Transaction.created_at, "%Y-%m-01"))
+
+
+class RollupService:
+    """Mantiene transaction_rollups (suma y conteo por usuario, mes, categoría y tipo).
+
+    Los métodos no hacen commit: se ejecutan dentro de la transacción de quien modifica las transacciones.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def bucket(user_id: int, created_at: datetime, category: Optional[str], transaction_type: str) -> tuple:
+        return user_id, month_start(created_at), category or DEFAULT_CATEGORY, transaction_type
+
+    def apply_deltas(self, deltas: Dict[tuple, list]) -> None:
+        """Suma [monto, conteo] a cada bucket con un único upsert multi-fila."""
+        values = [
+            {
+                "user_id": user_id,
+                "month": month,
+                "category": category,
+                "type": transaction_type,
+                "total_amount": amount,
+                "transaction_count": count
+            }
+            for (user_id, month, category, transaction_type), (amount, count) in deltas.items()
+            if amount or count
+        ]
+        if not values:
+            return
+
+        if self.db.bind.dialect.name == "sqlite":
+            statement = sqlite_insert(TransactionRollup).values(values)
+            statement = statement.on_conflict_do_update(
+                index_elements=["user_id", "month", "category", "type"],
+                set_={
+                    "total_amount": TransactionRollup.total_amount + statement.excluded.total_amount,
+                    "transaction_count": TransactionRollup.transaction_count + statement.excluded.transaction_count
+                }
+            )
+        else:
+            statement = mysql_insert(TransactionRollup).values(values)
+            statement = statement.on_duplicate_key_update(
+                total_amount=TransactionRollup.total_amount + statement.inserted.total_amount,
+                transaction_count=TransactionRollup.transaction_count + statement.inserted.transaction_count
+            )
+        self.db.execute(statement)
+
+        # Los buckets que se quedan sin transacciones se eliminan
+        emptied = [key for key, (_, count) in deltas.items() if count < 0]
+        if emptied:
+            self.db.execute(delete(TransactionRollup).where(
+                tuple_(
+                    TransactionRollup.user_id, TransactionRollup.month,
+                    TransactionRollup.category, TransactionRollup.type
+                ).in_(emptied),
+                TransactionRollup.transaction_count <= 0
+            ))
+
+    def add_rows(self, rows: Iterable[dict]) -> None:
+        """Agrega filas recién insertadas (dicts con user_id, created_at, category, type y amount)."""
+        deltas = defaultdict(lambda: [0.0, 0])
+        for row in rows:
+            key = self.bucket(row["user_id"], row["created_at"], row.get("category"), row["type"])
+            deltas[key][0] += float(row.get("amount") or 0)
+            deltas[key][1] += 1
+        self.apply_deltas(deltas)
+
+    def move(self, old: Optional[tuple], new: Optional[tuple]) -> None:
+        """Mueve una transacción entre buckets. old y new son (bucket, monto); None para inserciones o borrados."""
+        deltas = defaultdict(lambda: [0.0, 0])
+        if old is not None:
+            key, amount = old
+            deltas[key][0] -= float(amount or 0)
+            deltas[key][1] -= 1
+        if new is not None:
+            key, amount = new
+            deltas[key][0] += float(amount or 0)
+            deltas[key][1] += 1
+        self.apply_deltas(deltas)
+
+    def monthly_totals(self, user_id: int, month: date, transaction_type: str = "expense") -> Dict[str, float]:
+        """Totales por categoría de un mes, leídos del rollup en O(categorías)."""
+        rows = self.db.query(TransactionRollup.category, TransactionRollup.total_amount).filter(
+            TransactionRollup.user_id == user_id,
+            TransactionRollup.month == month_start(month),
+            TransactionRollup.type == transaction_type
+        ).all()
+        return {category: float(total) for category, total in rows}
+
+    def rebuild_users(self, user_ids: List[int]) -> None:
+        """Recalcula desde cero los rollups de los usuarios indicados con un INSERT ... SELECT agrupado."""
+        self.db.execute(delete(TransactionRollup).where(TransactionRollup.user_id.in_(user_ids)))
+        month = month_start_expression(self.db)
+        category = func.coalesce(Transaction.category, DEFAULT_CATEGORY)
+        aggregated = select(
+            Transaction.user_id,
+            month,
+            category,
+            Transaction.type,
+            func.coalesce(func.sum(Transaction.amount), 0),
+            func.count(Transaction.id)
+        ).where(
+            Transaction.user_id.in_(user_ids),
+            Transaction.created_at.is_not(None)
+        ).group_by(Transaction.user_id, month, category, Transaction.type)
+        self.db.execute(insert(TransactionRollup).from_select(
+            ["user_id", "month", "category", "type", "total_amount", "transaction_count"],
+            aggregated
+        ))
@@ -0,0 +1,52 @@
+from typing import Optional
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session
+from app.models.transaction import Transaction
+from app.schemas.transaction import TransactionFilter
+from app.utils.text_index import get_user_index
+from .transaction_service import apply_transaction_filters
+
+
+class SearchService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def search(self, user_id: int, query: str, filters: Optional[TransactionFilter] = None, limit: int = 20, offset: int = 0) -> dict:
+        """Busca en las descripciones por relevancia. Usa el índice FULLTEXT en MySQL y un índice invertido local en otros motores."""
+        if self.db.bind.dialect.name == "mysql":
+            hits = self._search_fulltext(user_id, query, filters, limit + 1, offset)
+        else:
+            hits = self._search_inverted_index(user_id, query, filters, limit + 1, offset)
+        return {
+            "items": [{"transaction": transaction, "score": score} for transaction, score in hits[:limit]],
+            "next_offset": offset + limit if len(hits) > limit else None
+        }
+
+    def _search_fulltext(self, user_id: int, query: str, filters: Optional[TransactionFilter], limit: int, offset: int) -> list:
+        score = match(Transaction.description, against=query).in_natural_language_mode()
+        statement = self.db.query(Transaction, score.label("score")).filter(
+            Transaction.user_id == user_id,
+            score > 0
+        )
+        statement = apply_transaction_filters(statement, filters)
+        rows = statement.order_by(score.desc(), Transaction.id.desc()).offset(offset).limit(limit).all()
+        return [(transaction, float(row_score)) for transaction, row_score in rows]
+
+    def _search_inverted_index(self, user_id: int, query: str, filters: Optional[TransactionFilter], limit: int, offset: int) -> list:
+        def load_documents():
+            return self.db.query(Transaction.id, Transaction.description).filter(
+                Transaction.user_id == user_id,
+                Transaction.description.is_not(None)
+            ).execution_options(yield_per=5000)
+
+        ranked = get_user_index(user_id, load_documents).search(query)
+        if not ranked:
+            return []
+
+        candidates = self.db.query(Transaction).filter(
+            Transaction.user_id == user_id,
+            Transaction.id.in_([doc_id for doc_id, _ in ranked])
+        )
+        by_id = {transaction.id: transaction for transaction in apply_transaction_filters(candidates, filters)}
+        matches = [(by_id[doc_id], score) for doc_id, score in ranked if doc_id in by_id]
+        return matches[offset:offset + limit]
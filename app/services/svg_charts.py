@@ -0,0 +1,110 @@
+import math
+from typing import List
+from xml.sax.saxutils import escape
+
+BAR_COLORS = ("#87ceeb", "#fa8072")  # skyblue y salmon, como en los gráficos de matplotlib
+PIE_COLORS = ("#ff9999", "#66b3ff", "#99ff99", "#ffcc99")
+FONT = 'font-family="DejaVu Sans, Helvetica, Arial, sans-serif"'
+
+
+def _nice_step(maximum: float, ticks: int = 5) -> float:
+    raw = maximum / ticks
+    magnitude = 10 ** math.floor(math.log10(raw))
+    for factor in (1, 2, 2.5, 5, 10):
+        if raw <= factor * magnitude:
+            return factor * magnitude
+    return 10 * magnitude
+
+
+def _number(value: float) -> str:
+    return f"{value:,.0f}" if abs(value) >= 1 or value == 0 else f"{value:g}"
+
+
+def render_bar_chart_svg(categories: List[str], recommended_values: List[float], actual_values: List[float]) -> str:
+    """Gráfico de barras agrupadas recomendado vs. real como documento SVG."""
+    width, height = 1000, 600
+    left, right, top, bottom = 90, 30, 60, 140
+    plot_width, plot_height = width - left - right, height - top - bottom
+    maximum = max([0.0] + [float(v) for v in recommended_values] + [float(v) for v in actual_values]) or 1.0
+    step = _nice_step(maximum)
+    axis_max = math.ceil(maximum / step) * step
+
+    def y(value: float) -> float:
+        return top + plot_height - float(value) / axis_max * plot_height
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}" {FONT} font-size="12">',
+        f'<rect width="{width}" height="{height}" fill="white"/>',
+        f'<text x="{left + plot_width / 2}" y="30" text-anchor="middle" font-size="16">Comparación de Presupuesto Recomendado vs. Real</text>'
+    ]
+    tick = 0.0
+    while tick <= axis_max + step / 2:
+        ty = y(tick)
+        parts.append(f'<line x1="{left - 5}" y1="{ty:.1f}" x2="{left}" y2="{ty:.1f}" stroke="black"/>')
+        parts.append(f'<text x="{left - 8}" y="{ty + 4:.1f}" text-anchor="end">{_number(tick)}</text>')
+        tick += step
+
+    slot = plot_width / max(len(categories), 1)
+    bar_width = slot * 0.35
+    for index, category in enumerate(categories):
+        center = left + slot * (index + 0.5)
+        for offset, value, color in ((-1, recommended_values[index], BAR_COLORS[0]), (0, actual_values[index], BAR_COLORS[1])):
+            bar_y = y(value)
+            parts.append(
+                f'<rect x="{center + offset * bar_width:.1f}" y="{bar_y:.1f}" width="{bar_width:.1f}" '
+                f'height="{top + plot_height - bar_y:.1f}" fill="{color}"/>'
+            )
+        label_y = top + plot_height + 15
+        parts.append(
+            f'<text x="{center:.1f}" y="{label_y}" text-anchor="end" transform="rotate(-45 {center:.1f} {label_y})">{escape(category)}</text>'
+        )
+
+    parts += [
+        f'<rect x="{left}" y="{top}" width="{plot_width}" height="{plot_height}" fill="none" stroke="black"/>',
+        f'<text x="{left + plot_width / 2}" y="{height - 15}" text-anchor="middle">Categorías</text>',
+        f'<text x="20" y="{top + plot_height / 2}" text-anchor="middle" transform="rotate(-90 20 {top + plot_height / 2})">Monto (COP)</text>'
+    ]
+    for index, (label, color) in enumerate((("Recomendado", BAR_COLORS[0]), ("Real", BAR_COLORS[1]))):
+        legend_y = top + 12 + index * 20
+        parts.append(f'<rect x="{left + 12}" y="{legend_y - 9}" width="22" height="10" fill="{color}"/>')
+        parts.append(f'<text x="{left + 40}" y="{legend_y}">{label}</text>')
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+def render_pie_chart_svg(labels: List[str], values: List[float]) -> str:
+    """Gráfico circular de la distribución de gastos como documento SVG."""
+    size, radius = 800, 260
+    cx, cy = size / 2, size / 2 + 20
+    total = sum(float(v) for v in values)
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" viewBox="0 0 {size} {size}" {FONT} font-size="14">',
+        f'<rect width="{size}" height="{size}" fill="white"/>',
+        f'<text x="{cx}" y="50" text-anchor="middle" font-size="18">Distribución de Gastos Reales</text>'
+    ]
+    # Igual que matplotlib con startangle=140: se empieza en 140° y se avanza en sentido antihorario
+    angle = 140.0
+    for index, (label, value) in enumerate(zip(labels, values)):
+        if total <= 0 or float(value) <= 0:
+            continue
+        sweep = float(value) / total * 360
+        color = PIE_COLORS[index % len(PIE_COLORS)]
+        if sweep >= 359.999:
+            parts.append(f'<circle cx="{cx}" cy="{cy}" r="{radius}" fill="{color}"/>')
+        else:
+            start, end = math.radians(angle), math.radians(angle + sweep)
+            x1, y1 = cx + radius * math.cos(start), cy - radius * math.sin(start)
+            x2, y2 = cx + radius * math.cos(end), cy - radius * math.sin(end)
+            large_arc = 1 if sweep > 180 else 0
+            parts.append(
+                f'<path d="M{cx},{cy} L{x1:.2f},{y1:.2f} A{radius},{radius} 0 {large_arc} 0 {x2:.2f},{y2:.2f} Z" fill="{color}"/>'
+            )
+        middle = math.radians(angle + sweep / 2)
+        px, py = cx + radius * 0.6 * math.cos(middle), cy - radius * 0.6 * math.sin(middle)
+        lx, ly = cx + radius * 1.1 * math.cos(middle), cy - radius * 1.1 * math.sin(middle)
+        anchor = "start" if math.cos(middle) >= 0 else "end"
+        parts.append(f'<text x="{px:.1f}" y="{py + 5:.1f}" text-anchor="middle">{float(value) / total * 100:.1f}%</text>')
+        parts.append(f'<text x="{lx:.1f}" y="{ly + 5:.1f}" text-anchor="{anchor}">{escape(str(label))}</text>')
+        angle += sweep
+    parts.append("</svg>")
+    return "".join(parts)
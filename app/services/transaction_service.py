@@ -1,25 +1,153 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, insert, select, func, text
+from sqlalchemy.orm import Session, Query
 from app.models.transaction import Transaction
 from app.models.user import User
+from app.schemas.transaction import TransactionFilter, TransactionCreate
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.text_index import invalidate_user_index
+from .rollup_service import RollupService
+from .change_feed_service import ChangeFeedService
 from fastapi import HTTPException
+from pydantic import ValidationError
+from typing import Optional
 import logging
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+BULK_INSERT_CHUNK_SIZE = 500
+MAX_BULK_ITEMS = 10000
+TRANSACTION_TYPES = ("income", "expense")
+
+def apply_transaction_filters(query: Query, filters: Optional[TransactionFilter]) -> Query:
+    """Aplica los filtros de rango de fechas, tipo, categorías y montos a una consulta de transacciones."""
+    if filters is None:
+        return query
+    if filters.start_date is not None:
+        query = query.filter(Transaction.created_at >= filters.start_date)
+    if filters.end_date is not None:
+        query = query.filter(Transaction.created_at < filters.end_date)
+    if filters.type is not None:
+        query = query.filter(Transaction.type == filters.type)
+    if filters.categories:
+        query = query.filter(Transaction.category.in_([c.value for c in filters.categories]))
+    if filters.min_amount is not None:
+        query = query.filter(Transaction.amount >= filters.min_amount)
+    if filters.max_amount is not None:
+        query = query.filter(Transaction.amount <= filters.max_amount)
+    return query
+
 class TransactionService:
     def __init__(self, db: Session):
         self.db = db
 
-    def create_transaction(self, transaction: dict, user_id: int) -> Transaction:
-        db_transaction = Transaction(**transaction, user_id=user_id)
-        self.db.add(db_transaction)
+    @staticmethod
+    def _rollup_entry(transaction: Transaction) -> tuple:
+        category = transaction.category.value if hasattr(transaction.category, "value") else transaction.category
+        bucket = RollupService.bucket(transaction.user_id, transaction.created_at, category, transaction.type)
+        return bucket, transaction.amount
+
+    def _finish_write(self, transaction: Optional[Transaction], user_id: int, commit: bool) -> None:
+        if not commit:
+            self.db.flush()
+            if transaction is not None:
+                self.db.refresh(transaction)
+            return
         self.db.commit()
-        self.db.refresh(db_transaction)
+        if transaction is not None:
+            self.db.refresh(transaction)
+        invalidate_user_index(user_id)
+
+    def create_transaction(self, transaction: dict, user_id: int, commit: bool = True) -> Transaction:
+        """Con commit=False solo hace flush: quien llama confirma la transacción e invalida el índice de búsqueda."""
+        db_transaction = Transaction(**transaction, user_id=user_id, change_seq=ChangeFeedService(self.db).allocate(user_id))
+        self.db.add(db_transaction)
+        self.db.flush()
+        self.db.refresh(db_transaction)  # Obtener created_at asignado por el servidor
+        RollupService(self.db).move(None, self._rollup_entry(db_transaction))
+        self._finish_write(db_transaction, user_id, commit)
         logger.info(f"Transacción creada con id: {db_transaction.id} por usuario: {user_id}")
         return db_transaction
 
+    def insert_transaction_rows(self, rows: list[dict]) -> list[int]:
+        """Inserta filas ya validadas con INSERT multi-fila por bloques, sin hacer commit. Devuelve los ids asignados."""
+        if any(row.get("created_at") is None for row in rows):
+            # Se fija la fecha explícitamente para poder asignar cada fila a su bucket del rollup
+            now = self.db.execute(select(func.now())).scalar()
+            for row in rows:
+                if row.get("created_at") is None:
+                    row["created_at"] = now
+        # Cada fila recibe su número de cambio, reservados en un solo bloque por usuario
+        for user_id in {row["user_id"] for row in rows}:
+            user_rows = [row for row in rows if row["user_id"] == user_id]
+            first_seq = ChangeFeedService(self.db).allocate(user_id, len(user_rows))
+            for offset, row in enumerate(user_rows):
+                row["change_seq"] = first_seq + offset
+        for start in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+            self.db.execute(insert(Transaction).values(rows[start:start + BULK_INSERT_CHUNK_SIZE]))
+        RollupService(self.db).add_rows(rows)
+        # Los ids de un INSERT multi-fila no son necesariamente consecutivos (innodb_autoinc_lock_mode=2,
+        # auto_increment_increment > 1): se leen por (user_id, change_seq), que es único y usa su índice
+        ids_by_seq = {}
+        for user_id in {row["user_id"] for row in rows}:
+            seqs = [row["change_seq"] for row in rows if row["user_id"] == user_id]
+            ids_by_seq.update({
+                (user_id, change_seq): transaction_id
+                for transaction_id, change_seq in self.db.query(Transaction.id, Transaction.change_seq).filter(
+                    Transaction.user_id == user_id,
+                    Transaction.change_seq.between(min(seqs), max(seqs))
+                )
+            })
+        return [ids_by_seq[(row["user_id"], row["change_seq"])] for row in rows]
+
+    def bulk_create_transactions(self, items: list[dict], user_id: int) -> dict:
+        """Valida una lista de transacciones y las inserta con INSERT multi-fila en una sola transacción."""
+        if len(items) > MAX_BULK_ITEMS:
+            raise HTTPException(status_code=413, detail=f"Se permiten como máximo {MAX_BULK_ITEMS} transacciones por lote")
+
+        results = [{"index": index, "id": None, "errors": None} for index in range(len(items))]
+        valid_rows = []
+        valid_indexes = []
+        for index, item in enumerate(items):
+            try:
+                transaction = TransactionCreate(**item)
+                if transaction.type not in TRANSACTION_TYPES:
+                    raise ValueError(f"Tipo inválido: {transaction.type}. Debe ser uno de {list(TRANSACTION_TYPES)}")
+            except ValidationError as e:
+                results[index]["errors"] = [
+                    f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}" for error in e.errors()
+                ]
+                continue
+            except ValueError as e:
+                results[index]["errors"] = [str(e)]
+                continue
+            row = transaction.dict()
+            row["category"] = transaction.category.value if transaction.category else None
+            row["user_id"] = user_id
+            valid_rows.append(row)
+            valid_indexes.append(index)
+
+        try:
+            ids = self.insert_transaction_rows(valid_rows)
+            for index, transaction_id in zip(valid_indexes, ids):
+                results[index]["id"] = transaction_id
+            self.db.commit()
+            invalidate_user_index(user_id)
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error en la inserción masiva de transacciones para usuario {user_id}: {e}")
+            raise HTTPException(status_code=500, detail="Error al guardar las transacciones")
+
+        logger.info(f"{len(valid_rows)} transacciones creadas en lote por usuario: {user_id}")
+        return {
+            "created": len(valid_rows),
+            "failed": len(items) - len(valid_rows),
+            "results": results
+        }
+
     def get_transaction(self, transaction_id: int, user_id: int) -> Transaction:
         transaction = self.db.query(Transaction).filter(
             Transaction.id == transaction_id,
@@ -33,21 +161,102 @@ class TransactionService:
     def get_all_transactions(self, user_id: int) -> list[Transaction]:
         return self.db.query(Transaction).filter(Transaction.user_id == user_id).all()
 
-    def update_transaction(self, transaction_id: int, transaction_update: dict, user_id: int) -> Transaction:
+    def list_transactions(
+        self,
+        user_id: int,
+        filters: Optional[TransactionFilter] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None
+    ) -> dict:
+        """Devuelve una página de transacciones ordenadas por (created_at, id) descendente usando paginación por cursor."""
+        try:
+            position = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        query = self.db.query(Transaction).filter(Transaction.user_id == user_id)
+        query = apply_transaction_filters(query, filters)
+        if position is not None:
+            last_created_at, last_id = position
+            query = query.filter(or_(
+                Transaction.created_at < last_created_at,
+                and_(Transaction.created_at == last_created_at, Transaction.id < last_id)
+            ))
+
+        # Se pide una fila extra para saber si existe una página siguiente
+        rows = query.order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(limit + 1).all()
+        items = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor(last.created_at, last.id)
+        return {"items": items, "next_cursor": next_cursor}
+
+    def expense_window_query(self, user_id: int, start_date, end_date) -> Query:
+        """Gastos del usuario en [start_date, end_date). Compara type directamente para usar ix_transactions_user_type_created."""
+        return self.db.query(Transaction).filter(
+            Transaction.user_id == user_id,
+            Transaction.type == "expense",
+            Transaction.created_at >= start_date,
+            Transaction.created_at < end_date
+        ).order_by(Transaction.created_at)
+
+    def expense_window_totals(self, user_id: int, start_date, end_date) -> Query:
+        """Suma por categoría de los gastos de la ventana, calculada con GROUP BY en la base de datos."""
+        return self.expense_window_query(user_id, start_date, end_date).order_by(None).with_entities(
+            Transaction.category,
+            func.sum(Transaction.amount)
+        ).group_by(Transaction.category).order_by(Transaction.category)
+
+    def iter_expense_window_rows(self, user_id: int, start_date, end_date, batch_size: int = 1000):
+        """Recorre los gastos de la ventana como tuplas con un cursor del lado del servidor, sin cargar objetos ORM."""
+        query = self.expense_window_query(user_id, start_date, end_date).with_entities(
+            Transaction.category,
+            Transaction.amount,
+            Transaction.description,
+            Transaction.created_at
+        )
+        return query.execution_options(stream_results=True, yield_per=batch_size)
+
+    def explain_expense_window(self, user_id: int, start_date, end_date) -> list[dict]:
+        """Ejecuta EXPLAIN sobre la consulta de ventana de gastos y devuelve el plan como diccionarios."""
+        statement = self.expense_window_query(user_id, start_date, end_date).statement
+        compiled = statement.compile(dialect=self.db.bind.dialect, compile_kwargs={"literal_binds": True})
+        result = self.db.execute(text(f"EXPLAIN {compiled}"))
+        return [dict(row._mapping) for row in result]
+
+    def iter_transaction_rows(self, user_id: int, filters: Optional[TransactionFilter] = None, batch_size: int = 1000):
+        """Recorre las transacciones con un cursor del lado del servidor, sin materializar el resultado completo."""
+        query = self.db.query(
+            Transaction.id,
+            Transaction.type,
+            Transaction.amount,
+            Transaction.category,
+            Transaction.description,
+            Transaction.created_at
+        ).filter(Transaction.user_id == user_id)
+        query = apply_transaction_filters(query, filters)
+        query = query.order_by(Transaction.created_at, Transaction.id)
+        return query.execution_options(stream_results=True, yield_per=batch_size)
+
+    def update_transaction(self, transaction_id: int, transaction_update: dict, user_id: int, commit: bool = True) -> Transaction:
         transaction = self.db.query(Transaction).filter(
             Transaction.id == transaction_id,
             Transaction.user_id == user_id
         ).first()
         if not transaction:
             raise HTTPException(status_code=404, detail="Transacción no encontrada")
+        old_entry = self._rollup_entry(transaction)
         for key, value in transaction_update.items():
             if value is not None:  # Solo actualizar campos no nulos
                 setattr(transaction, key, value)
-        self.db.commit()
-        self.db.refresh(transaction)
+        transaction.change_seq = ChangeFeedService(self.db).allocate(user_id)
+        RollupService(self.db).move(old_entry, self._rollup_entry(transaction))
+        self._finish_write(transaction, user_id, commit)
         return transaction
 
-    def delete_transaction(self, transaction_id: int, user_id: int) -> dict:
+    def delete_transaction(self, transaction_id: int, user_id: int, commit: bool = True) -> dict:
         transaction = self.db.query(Transaction).filter(
             Transaction.id == transaction_id,
             Transaction.user_id == user_id
@@ -56,7 +265,9 @@ class TransactionService:
             logger.error(f"Transacción con id {transaction_id} no encontrada para usuario {user_id}")
             raise HTTPException(status_code=404, detail="Transacción no encontrada")
 
+        RollupService(self.db).move(self._rollup_entry(transaction), None)
+        ChangeFeedService(self.db).record_delete(user_id, transaction_id)
         self.db.delete(transaction)
-        self.db.commit()
+        self._finish_write(None, user_id, commit)
         logger.info(f"Transacción con id {transaction_id} eliminada por usuario {user_id}")
         return {"message": "Transacción eliminada exitosamente"}
\ No newline at end of file
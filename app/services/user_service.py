@@ -6,6 +6,7 @@ from ..models.role import Role
 from ..utils.auth import verify_password, get_password_hash
 from ..services.verification_service import VerificationService
 from ..utils.email_service import EmailService
+from ..utils.auth_cache import invalidate_user_principal
 import logging
 from typing import Optional
 
@@ -74,6 +75,7 @@ class UserService:
         user.phone = user_update.phone
         user.password_hash = get_password_hash(user_update.password)
         self.db.commit()
+        invalidate_user_principal(user_id)
         self.db.refresh(user)
         logger.info(f"User with id {user_id} updated successfully")
         return user
@@ -86,6 +88,7 @@ class UserService:
 
         self.db.delete(user)
         self.db.commit()
+        invalidate_user_principal(user_id)
         logger.info(f"User with id {user_id} deleted successfully")
         return {"message": "Usuario eliminado exitosamente"}
 
@@ -97,6 +100,7 @@ class UserService:
 
         user.role = new_role
         self.db.commit()
+        invalidate_user_principal(user_id)
         self.db.refresh(user)
         logger.info(f"Role changed for user with id {user_id} to {new_role.value}")
         return user
\ No newline at end of file
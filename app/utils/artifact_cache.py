@@ -0,0 +1,115 @@
+# utils/artifact_cache.py
+# Caché en disco de artefactos de reportes (gráficos, PDFs) direccionada por contenido y con desalojo LRU por tamaño.
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", "reports/cache")
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+
+def content_key(*parts: Any) -> str:
+    """Hash estable de las entradas de un artefacto; el mismo contenido siempre produce la misma clave."""
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ArtifactCache:
+    def __init__(self, root: str = REPORT_CACHE_DIR, max_bytes: int = REPORT_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._entries: Optional[OrderedDict] = None  # nombre -> tamaño, del menos al más usado
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def path_for(self, key: str, extension: str) -> str:
+        return os.path.join(self.root, f"{key}{extension}")
+
+    def get(self, key: str, extension: str) -> Optional[str]:
+        """Devuelve la ruta del artefacto si está en caché y lo marca como usado recientemente."""
+        path = self.path_for(key, extension)
+        if not os.path.exists(path):
+            return None
+        with self._lock:
+            entries = self._load()
+            name = os.path.basename(path)
+            if name in entries:
+                entries.move_to_end(name)
+        try:
+            os.utime(path)  # El mtime conserva el orden LRU entre reinicios
+        except FileNotFoundError:
+            return None
+        return path
+
+    def temp_path(self, key: str, extension: str) -> str:
+        """Ruta temporal donde escribir un artefacto antes de publicarlo con commit()."""
+        os.makedirs(self.root, exist_ok=True)
+        return os.path.join(self.root, f".{key}.{uuid.uuid4().hex}.tmp{extension}")
+
+    def commit(self, temp_path: str, key: str, extension: str) -> str:
+        """Publica el artefacto de forma atómica y desaloja los menos usados si se supera el tamaño máximo."""
+        path = self.path_for(key, extension)
+        os.replace(temp_path, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            entries = self._load()
+            name = os.path.basename(path)
+            self._size += size - entries.pop(name, 0)
+            entries[name] = size
+            self._evict(keep=name)
+        return path
+
+    def get_or_create(self, key: str, extension: str, produce: Callable[[str], Any]) -> str:
+        """Devuelve el artefacto en caché o lo genera con produce(ruta_temporal)."""
+        path = self.get(key, extension)
+        if path is not None:
+            return path
+        temp_path = self.temp_path(key, extension)
+        try:
+            produce(temp_path)
+            return self.commit(temp_path, key, extension)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _load(self) -> OrderedDict:
+        if self._entries is None:
+            self._entries = OrderedDict()
+            if os.path.isdir(self.root):
+                files = []
+                for entry in os.scandir(self.root):
+                    if entry.is_file() and not entry.name.startswith("."):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, entry.name, stat.st_size))
+                for _, name, size in sorted(files):
+                    self._entries[name] = size
+                    self._size += size
+        return self._entries
+
+    def _evict(self, keep: str) -> None:
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            name, size = next(iter(self._entries.items()))
+            if name == keep:
+                break
+            del self._entries[name]
+            self._size -= size
+            try:
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+
+
+_cache: Optional[ArtifactCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_artifact_cache() -> ArtifactCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ArtifactCache()
+        return _cache
@@ -0,0 +1,118 @@
+# utils/auth_cache.py
+# Caché en memoria del proceso para autenticar sin consultar la base de datos en cada petición: tokens ya verificados
+# (hasta su exp) y el principal de cada usuario (id, rol, verificado), con desalojo LRU e invalidación por usuario.
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+from app.models.role import Role
+from app.utils.permissions import PermissionController, get_permissions
+
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+# Límite para cambios que no pasan por UserService o que se hacen en otro proceso
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "30"))
+
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """Lo que las rutas necesitan del usuario autenticado; reemplaza al objeto ORM fuera de la sesión."""
+    id: int
+    email: str
+    role: Role
+    is_verified: bool
+
+    @classmethod
+    def from_user(cls, user) -> "UserPrincipal":
+        return cls(id=user.id, email=user.email, role=user.role, is_verified=bool(user.is_verified))
+
+    def get_permissions(self) -> PermissionController:
+        return get_permissions(self.role)
+
+
+class AuthCache:
+    def __init__(self, max_tokens: int = AUTH_TOKEN_CACHE_SIZE, max_users: int = AUTH_USER_CACHE_SIZE,
+                 user_ttl: float = AUTH_USER_CACHE_TTL):
+        self.max_tokens = max_tokens
+        self.max_users = max_users
+        self.user_ttl = user_ttl
+        self._tokens: OrderedDict = OrderedDict()  # token -> (email, exp)
+        self._users: OrderedDict = OrderedDict()  # email -> (principal, generación, vence)
+        self._generations: Dict[int, int] = {}
+        self._invalidations = 0
+        self._lock = threading.Lock()
+
+    def get_token_subject(self, token: str) -> Optional[str]:
+        """Email de un token ya verificado, mientras no haya pasado su exp."""
+        with self._lock:
+            entry = self._tokens.get(token)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._tokens[token]
+                return None
+            self._tokens.move_to_end(token)
+            return entry[0]
+
+    def put_token(self, token: str, email: str, exp) -> None:
+        if not exp:
+            return  # Sin exp no hay un límite seguro para reutilizar la verificación
+        with self._lock:
+            self._tokens[token] = (email, float(exp))
+            self._tokens.move_to_end(token)
+            while len(self._tokens) > self.max_tokens:
+                self._tokens.popitem(last=False)
+
+    def snapshot(self) -> int:
+        """Se toma antes de leer el usuario de la base de datos y se pasa a put_principal."""
+        with self._lock:
+            return self._invalidations
+
+    def get_principal(self, email: str) -> Optional[UserPrincipal]:
+        with self._lock:
+            entry = self._users.get(email)
+            if entry is None:
+                return None
+            principal, generation, expires_at = entry
+            if expires_at <= time.monotonic() or generation != self._generations.get(principal.id, 0):
+                del self._users[email]
+                return None
+            self._users.move_to_end(email)
+            return principal
+
+    def put_principal(self, principal: UserPrincipal, snapshot: int) -> None:
+        with self._lock:
+            # Si hubo una invalidación durante la consulta, lo leído puede ser anterior al cambio: no se guarda
+            if snapshot != self._invalidations:
+                return
+            generation = self._generations.get(principal.id, 0)
+            self._users[principal.email] = (principal, generation, time.monotonic() + self.user_ttl)
+            self._users.move_to_end(principal.email)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Incrementa la generación del usuario: sus principales guardados dejan de valer sin buscarlos por email."""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self._invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tokens.clear()
+            self._users.clear()
+            self._generations.clear()
+            self._invalidations += 1
+
+
+_cache = AuthCache()
+
+
+def get_auth_cache() -> AuthCache:
+    return _cache
+
+
+def invalidate_user_principal(user_id: int) -> None:
+    _cache.invalidate_user(user_id)
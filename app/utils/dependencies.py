@@ -5,25 +5,38 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models.user import User
 from app.utils.auth import SECRET_KEY, ALGORITHM
+from app.utils.auth_cache import UserPrincipal, get_auth_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> UserPrincipal:
+    """Devuelve el principal del usuario autenticado; con la caché caliente no decodifica el JWT ni consulta la base."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudo validar las credenciales",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+    cache = get_auth_cache()
+    email = cache.get_token_subject(token)
+    if email is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            email: str = payload.get("sub")
+            if email is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+        cache.put_token(token, email, payload.get("exp"))
+
+    principal = cache.get_principal(email)
+    if principal is not None:
+        return principal
 
+    snapshot = cache.snapshot()
     user = db.query(User).filter(User.email == email).first()
     if user is None:
         raise credentials_exception
 
-    return user
\ No newline at end of file
+    principal = UserPrincipal.from_user(user)
+    cache.put_principal(principal, snapshot)
+    return principal
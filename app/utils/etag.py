@@ -0,0 +1,32 @@
+# utils/etag.py
+# ETag / If-Match para el control de concurrencia optimista sobre cuestionarios y presupuestos.
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+PRECONDITION_FAILED_DETAIL = "El recurso fue modificado por otra petición; vuelve a leerlo e intenta de nuevo"
+
+
+def format_etag(*parts) -> str:
+    return '"' + ".".join(str(part) for part in parts) + '"'
+
+
+def check_if_match(if_match: Optional[str], current_etag: str) -> None:
+    """Sin If-Match la escritura es incondicional; con él debe coincidir con la versión actual o se responde 412."""
+    if not if_match:
+        return
+    candidates = [candidate.strip() for candidate in if_match.split(",")]
+    # Las ETags débiles (W/"...") se comparan por su valor
+    candidates = [candidate[2:] if candidate.startswith("W/") else candidate for candidate in candidates]
+    if "*" not in candidates and current_etag not in candidates:
+        raise HTTPException(status_code=412, detail=PRECONDITION_FAILED_DETAIL)
+
+
+def commit_versioned(db: Session) -> None:
+    """Hace commit; si el UPDATE no encontró la versión leída (otra escritura ganó) se responde 412 sin esperar."""
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=412, detail=PRECONDITION_FAILED_DETAIL)
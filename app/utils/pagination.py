@@ -0,0 +1,43 @@
+# utils/pagination.py
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Codifica la posición (created_at, id) de la última fila en un cursor opaco."""
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """Decodifica un cursor opaco. Lanza ValueError si el cursor no es válido."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+
+
+def encode_sequence_cursor(seq: int, row_id: int) -> str:
+    """Codifica la posición (secuencia de cambio, id) en el feed de cambios como cursor opaco."""
+    return base64.urlsafe_b64encode(f"seq:{seq}:{row_id}".encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_sequence_cursor(cursor: Optional[str]) -> Tuple[int, int]:
+    """Decodifica un cursor del feed; sin cursor se empieza desde el principio. Lanza ValueError si no es válido."""
+    if not cursor:
+        return -1, 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, seq, row_id = base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii").split(":")
+        if prefix != "seq":
+            raise ValueError(prefix)
+        return int(seq), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
@@ -0,0 +1,64 @@
+# utils/recommendation_cache.py
+# Memoización en memoria de las recomendaciones de presupuesto, con desalojo LRU e invalidación por cuestionario.
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+RECOMMENDATION_CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "1024"))
+
+
+class RecommendationCache:
+    def __init__(self, max_entries: int = RECOMMENDATION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()  # clave -> (nombre, distribución, id del cuestionario)
+        self._by_questionnaire: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict[str, float]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        # Copia para que quien la reciba no modifique la distribución guardada
+        return entry[0], dict(entry[1])
+
+    def put(self, key: str, budget_name: str, distribution: Dict[str, float], questionnaire_id: Optional[int] = None) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._forget(key)
+            self._entries[key] = (budget_name, dict(distribution), questionnaire_id)
+            if questionnaire_id is not None:
+                self._by_questionnaire.setdefault(questionnaire_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._forget(next(iter(self._entries)))
+
+    def invalidate_questionnaire(self, questionnaire_id: int) -> None:
+        with self._lock:
+            for key in list(self._by_questionnaire.get(questionnaire_id, ())):
+                self._forget(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_questionnaire.clear()
+
+    def _forget(self, key: str) -> None:
+        _, _, questionnaire_id = self._entries.pop(key)
+        keys = self._by_questionnaire.get(questionnaire_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_questionnaire[questionnaire_id]
+
+
+_cache = RecommendationCache()
+
+
+def get_recommendation_cache() -> RecommendationCache:
+    return _cache
+
+
+def invalidate_questionnaire_recommendations(questionnaire_id: int) -> None:
+    _cache.invalidate_questionnaire(questionnaire_id)
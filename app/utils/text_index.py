@@ -0,0 +1,73 @@
+# utils/text_index.py
+# Índice invertido en memoria para buscar en descripciones cuando la base de datos no tiene FULLTEXT (p. ej. SQLite).
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict
+from typing import Callable, Dict, Iterable, List, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w{2,}")
+TEXT_INDEX_CACHE_SIZE = int(os.getenv("TEXT_INDEX_CACHE_SIZE", "256"))  # Usuarios con índice en memoria (LRU)
+
+
+def tokenize(text: str) -> List[str]:
+    decomposed = unicodedata.normalize("NFKD", (text or "").lower())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return TOKEN_PATTERN.findall(stripped)
+
+
+class InvertedIndex:
+    def __init__(self, documents: Iterable[Tuple[int, str]]):
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)  # término -> {id: frecuencia}
+        self.size = 0
+        for doc_id, text in documents:
+            self.size += 1
+            for term, frequency in Counter(tokenize(text)).items():
+                self.postings[term][doc_id] = frequency
+
+    def search(self, query: str) -> List[Tuple[int, float]]:
+        """Devuelve (id, puntuación) ordenados por relevancia usando tf-idf."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + self.size / len(postings))
+            for doc_id, frequency in postings.items():
+                scores[doc_id] += frequency * idf
+        return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+
+
+_indexes: OrderedDict = OrderedDict()  # user_id -> InvertedIndex, en orden de uso
+_generations: Dict[int, int] = {}
+_lock = threading.Lock()
+
+
+def get_user_index(user_id: int, loader: Callable[[], Iterable[Tuple[int, str]]]) -> InvertedIndex:
+    """Devuelve el índice del usuario, construyéndolo con loader() si no existe o fue invalidado.
+
+    La construcción ocurre fuera del lock; si el índice se invalida mientras tanto, el resultado se usa para esta
+    búsqueda pero no se guarda, porque pudo leerse antes del cambio.
+    """
+    with _lock:
+        index = _indexes.get(user_id)
+        if index is not None:
+            _indexes.move_to_end(user_id)
+            return index
+        generation = _generations.get(user_id, 0)
+    index = InvertedIndex(loader())
+    with _lock:
+        if _generations.get(user_id, 0) == generation:
+            _indexes[user_id] = index
+            _indexes.move_to_end(user_id)
+            while len(_indexes) > TEXT_INDEX_CACHE_SIZE:
+                _indexes.popitem(last=False)
+    return index
+
+
+def invalidate_user_index(user_id: int) -> None:
+    with _lock:
+        _generations[user_id] = _generations.get(user_id, 0) + 1
+        _indexes.pop(user_id, None)
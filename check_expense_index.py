@@ -0,0 +1,28 @@
+# check_expense_index.py
+# Verifica con EXPLAIN que la ventana de gastos usa el índice (user_id, type, created_at) con un range scan.
+import sys
+from datetime import date
+from dateutil.relativedelta import relativedelta
+from app.database import SessionLocal
+from app.services.transaction_service import TransactionService
+
+EXPECTED_INDEX = "ix_transactions_user_type_created"
+
+user_id = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+start_date = date.today().replace(day=1)
+end_date = start_date + relativedelta(months=1)
+
+db = SessionLocal()
+try:
+    plan = TransactionService(db).explain_expense_window(user_id, start_date, end_date)
+finally:
+    db.close()
+
+for row in plan:
+    print(row)
+
+transactions_row = next(row for row in plan if row.get("table") == "transactions")
+if transactions_row.get("key") != EXPECTED_INDEX or transactions_row.get("type") != "range":
+    print(f"La consulta no usa un range scan sobre {EXPECTED_INDEX}")
+    sys.exit(1)
+print(f"Range scan sobre {EXPECTED_INDEX} confirmado")
@@ -20,9 +20,78 @@ CREATE TABLE transactions (
     description VARCHAR(255),
     transaction_date DATE NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    change_seq BIGINT NOT NULL DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    INDEX ix_transactions_user_created_id (user_id, created_at, id),
+    INDEX ix_transactions_user_category_created_id (user_id, category, created_at, id),
+    INDEX ix_transactions_user_type_created (user_id, type, created_at),
+    FULLTEXT INDEX ft_transactions_description (description),
+    INDEX ix_transactions_user_change_seq (user_id, change_seq)
+);
+
+CREATE TABLE user_change_sequences (
+    user_id INT PRIMARY KEY,
+    last_seq BIGINT NOT NULL DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+CREATE TABLE transaction_tombstones (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    transaction_id INT NOT NULL,
+    change_seq BIGINT NOT NULL,
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    INDEX ix_transaction_tombstones_user_change_seq (user_id, change_seq)
+);
+
+CREATE TABLE transaction_rollups (
+    user_id INT NOT NULL,
+    month DATE NOT NULL,
+    category VARCHAR(32) NOT NULL,
+    type ENUM('income', 'expense') NOT NULL,
+    total_amount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    transaction_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, month, category, type),
     FOREIGN KEY (user_id) REFERENCES users(id)
 );
 
+CREATE TABLE idempotency_keys (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    method VARCHAR(10) NOT NULL,
+    path VARCHAR(255) NOT NULL,
+    request_hash CHAR(64) NOT NULL,
+    status ENUM('pending', 'completed') NOT NULL DEFAULT 'pending',
+    status_code INT,
+    response_body JSON,
+    response_hash CHAR(64),
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    UNIQUE KEY uq_idempotency_keys_user_key (user_id, idempotency_key),
+    INDEX ix_idempotency_keys_user_expires (user_id, expires_at)
+);
+
+CREATE TABLE import_jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    filename VARCHAR(255) NOT NULL,
+    file_path VARCHAR(512) NOT NULL,
+    format ENUM('csv', 'ofx') NOT NULL,
+    status ENUM('pending', 'running', 'completed', 'failed') NOT NULL DEFAULT 'pending',
+    processed_rows INT NOT NULL DEFAULT 0,
+    imported_rows INT NOT NULL DEFAULT 0,
+    failed_rows INT NOT NULL DEFAULT 0,
+    error VARCHAR(255),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    INDEX ix_import_jobs_user_id (user_id)
+);
+
 CREATE TABLE budgets (
     id INT AUTO_INCREMENT PRIMARY KEY,
     user_id INT NOT NULL,
@@ -31,9 +100,27 @@ CREATE TABLE budgets (
     actual_expenses JSON,
     report JSON,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    synced_seq BIGINT NOT NULL DEFAULT 0,
+    version INT NOT NULL DEFAULT 1,
     FOREIGN KEY (user_id) REFERENCES users(id)
 );
 
+CREATE TABLE report_jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    budget_id INT NOT NULL,
+    status ENUM('pending', 'running', 'completed', 'failed') NOT NULL DEFAULT 'pending',
+    active_key VARCHAR(64),
+    file_path VARCHAR(512),
+    error VARCHAR(255),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    FOREIGN KEY (budget_id) REFERENCES budgets(id) ON DELETE CASCADE,
+    UNIQUE KEY uq_report_jobs_active_key (active_key),
+    INDEX ix_report_jobs_user_id (user_id)
+);
+
 CREATE TABLE questionnaires (
     id INT AUTO_INCREMENT PRIMARY KEY,
     user_id INT NOT NULL,
@@ -41,9 +128,24 @@ CREATE TABLE questionnaires (
     monthly_income DECIMAL(10, 2) NOT NULL,
     estimated_expenses JSON NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    version INT NOT NULL DEFAULT 1,
     FOREIGN KEY (user_id) REFERENCES users(id)
 );
 
+CREATE TABLE questionnaire_expense_entries (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    questionnaire_id INT NOT NULL,
+    seq INT NOT NULL,
+    category VARCHAR(50) NOT NULL,
+    amount DECIMAL(12, 2) NOT NULL,
+    running_total DECIMAL(14, 2) NOT NULL,
+    description VARCHAR(255),
+    entry_date DATE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (questionnaire_id) REFERENCES questionnaires(id) ON DELETE CASCADE,
+    UNIQUE KEY uq_questionnaire_expense_entries_seq (questionnaire_id, seq)
+);
+
 CREATE TABLE verification_codes (
     id INT AUTO_INCREMENT PRIMARY KEY,
     user_id INT NOT NULL,